@@ -1,11 +1,16 @@
+import uuid
 import streamlit as st
-import random
-import re
-import pandas as pd
-import io
-from openai import OpenAI
-import google.generativeai as genai
-from mistralai import Mistral
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from ai_brain import HEDGE_DELAY, stream_ai_brain, clean_ai_response, get_provider_health, is_ai_error
+from evaluation import (STRUCTURED_EVAL, EVAL_SCHEMA, EvalStreamParser, build_eval_prompt, build_mentor_prompt,
+                        finish_structured_eval, parse_eval_score, parse_risk_score)
+from history_export import EXPORT_FORMATS, lazy_export
+from history_store import SessionHistory, get_history_store, get_session_claims
+from jobs import JOB_POLL_INTERVAL, DONE, FAILED, QUEUED, get_job_executor
+from llm_cache import get_llm_cache
+from prescore import get_prescorer
+from metrics import get_metrics
+from scenarios import build_public_prompt, build_secret_prompt, get_scenario_pool
 
 # --- 페이지 설정 ---
 st.set_page_config(page_title="위기대응 시뮬레이터 v15", page_icon="🛡️", layout="wide")
@@ -30,70 +35,177 @@ st.markdown("""
 if 'scenario_data' not in st.session_state: st.session_state.scenario_data = {}
 if 'evaluation_result' not in st.session_state: st.session_state.evaluation_result = None
 if 'mentor_solution' not in st.session_state: st.session_state.mentor_solution = None 
-if 'history' not in st.session_state: st.session_state.history = []
+if 'history' not in st.session_state:
+    # 세션 ID 를 URL 에 남겨 새로고침해도 같은 기록을 이어 본다.
+    # 공유된 링크로 다른 사람이 열면 (원래 세션이 아직 열려 있으면) 새 기록으로 시작한다.
+    session_id = st.query_params.get("sid")
+    ctx = get_script_run_ctx()
+    owner = ctx.session_id if ctx else None  # bare 모드(python CMcrisis.py)에는 세션이 없다
+    if not session_id or not get_session_claims().claim(session_id, owner):
+        session_id = uuid.uuid4().hex
+        get_session_claims().claim(session_id, owner)
+    st.query_params["sid"] = session_id
+    st.session_state.history = SessionHistory(get_history_store(), session_id)
+if 'export_cache' not in st.session_state: st.session_state.export_cache = {}
+if 'active_job' not in st.session_state: st.session_state.active_job = None
+if 'job_error' not in st.session_state: st.session_state.job_error = None
+if 'prescore_cache' not in st.session_state: st.session_state.prescore_cache = {}
 
-# --- 텍스트 정제 함수 ---
-def clean_ai_response(text):
-    if not text: return ""
-    text = text.strip()
-    text = re.sub(r"^```[a-zA-Z]*\n", "", text)
-    text = re.sub(r"\n```$", "", text)
-    return text.strip()
+# --- 유틸리티 ---
+def get_risk_color(score):
+    if score >= 80: return "risk-high", "🚨 위험 (DANGER)"
+    elif score >= 50: return "risk-mid", "⚠️ 주의 (CAUTION)"
+    else: return "risk-low", "✅ 안전 (SAFE)"
 
-# --- AI 호출 함수 ---
-def call_ai_brain(provider, api_key, system_role, user_prompt, temperature=0.5):
-    try:
-        if provider == "OpenAI (GPT-4o)":
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-4o", 
-                messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
-                temperature=temperature,
-                max_tokens=2000 
-            )
-            return response.choices[0].message.content
+# --- 백그라운드 작업 ---
+# LLM 호출은 공용 작업 실행기에서 돌려 스크립트 스레드를 막지 않는다.
+# job_panel 이 상태를 폴링하다가 끝나면 결과를 세션 상태에 옮겨 적는다.
+def run_scenario_job(job, provider, api_key, temperature, genre, platform, difficulty, fallbacks, hedge_delay):
+    sys_msg_public, user_msg_public = build_public_prompt(genre, platform, difficulty)
+    public_text = job.stream(
+        stream_ai_brain(provider, api_key, sys_msg_public, user_msg_public, temperature=temperature, use_cache=False, phase="briefing", fallbacks=fallbacks, hedge_delay=hedge_delay),
+        label=f"⚠️ [{difficulty}] 등급의 상황을 시뮬레이션 중..."
+    )
+    if public_text is None: return None
+    public_text = clean_ai_response(public_text)
+    if is_ai_error(public_text): raise RuntimeError(public_text)  # 오류 문구를 상황판에 올리지 않고 실패로 알린다
 
-        elif provider == "Google Gemini":
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(
-                f"{system_role}\n\n[상황/요청]\n{user_prompt}",
-                generation_config=genai.types.GenerationConfig(temperature=temperature, max_output_tokens=2000)
-            )
-            return response.text
+    sys_msg_secret, user_msg_secret = build_secret_prompt(public_text)
+    secret_text = job.stream(
+        stream_ai_brain(provider, api_key, sys_msg_secret, user_msg_secret, temperature=0.3, phase="secret", fallbacks=fallbacks, hedge_delay=hedge_delay),
+        label="🔒 [1급 기밀] 진짜 원인 작성 중...", show=False
+    )
+    if secret_text is None: return None
+    secret_text = clean_ai_response(secret_text)
+    if is_ai_error(secret_text): raise RuntimeError(secret_text)
+    return {"public": public_text, "cause": secret_text, "genre": genre}
 
-        elif provider == "Mistral AI":
-            client = Mistral(api_key=api_key)
-            response = client.chat.complete(
-                model="mistral-small-latest",
-                messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
-                temperature=temperature,
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-            
-    except Exception as e:
-        return f"⚠ AI 통신 오류 발생: {str(e)}"
+def run_eval_job(job, provider, api_key, temperature, scenario, action, notice, fallbacks, hedge_delay, structured=False, use_cache=True):
+    sys_msg, user_msg = build_eval_prompt(scenario['public'], scenario['cause'], action, notice, structured=structured)
+    if not structured:
+        text = job.stream(
+            stream_ai_brain(provider, api_key, sys_msg, user_msg, temperature=temperature, phase="evaluation",
+                            fallbacks=fallbacks, hedge_delay=hedge_delay, use_cache=use_cache),
+            label="🔮 미래의 타임라인을 계산 중입니다..."
+        )
+        return None if text is None else clean_ai_response(text)
 
-# --- 유틸리티 ---
-def parse_risk_score(text):
-    match = re.search(r"\[\[리스크:\s*(\d{1,3})\]\]", text)
-    return int(match.group(1)) if match else 50
+    # 구조화 모드: 점수/리스크가 도착하는 즉시 보이고, 나머지 칸은 받는 대로 채운다.
+    parser = EvalStreamParser()
+    text = job.stream(
+        stream_ai_brain(provider, api_key, sys_msg, user_msg, temperature=temperature, phase="evaluation",
+                        fallbacks=fallbacks, hedge_delay=hedge_delay, json_schema=EVAL_SCHEMA, use_cache=use_cache),
+        label="🔮 미래의 타임라인을 계산 중입니다...", render=parser.feed
+    )
+    if text is None: return None
+    if parser.invalid_fields(): job.label = "🩹 빠진 항목만 다시 받는 중..."
+    text = finish_structured_eval(parser, provider, api_key, fallbacks=fallbacks, hedge_delay=hedge_delay, use_cache=use_cache)
+    return None if job.cancelled else clean_ai_response(text)
 
-def parse_eval_score(text):
-    match = re.search(r"\[\[점수:\s*(\d{1,3})\]\]", text)
-    return int(match.group(1)) if match else 0
+def run_mentor_job(job, provider, api_key, scenario, fallbacks, hedge_delay):
+    sys_msg, user_msg = build_mentor_prompt(scenario['public'], scenario['cause'])
+    text = job.stream(
+        stream_ai_brain(provider, api_key, sys_msg, user_msg, temperature=0.5, phase="mentor", fallbacks=fallbacks, hedge_delay=hedge_delay),
+        label="🏃‍♂️ 사표 수리 중... (멘토가 대신 수습하는 중)"
+    )
+    return None if text is None else clean_ai_response(text)
 
-def get_risk_color(score):
-    if score >= 80: return "risk-high", "🚨 위험 (DANGER)"
-    elif score >= 50: return "risk-mid", "⚠️ 주의 (CAUTION)"
-    else: return "risk-low", "✅ 안전 (SAFE)"
+def cancel_active_job():
+    active = st.session_state.active_job
+    if active:
+        job = get_job_executor().get(active["id"])
+        if job is not None: job.cancel()
+    st.session_state.active_job = None
+
+def start_job(kind, fn, *args, **context):
+    # 진행 중인 작업이 있으면 새 요청으로 대체한다. 대기열이 가득 차면 False.
+    cancel_active_job()
+    job = get_job_executor().submit(kind, fn, *args)
+    if job is None:
+        st.warning("⏳ 지금은 요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.")
+        return False
+    st.session_state.active_job = {"id": job.id, "kind": kind, **context}
+    return True
+
+def apply_job_result(job, active):
+    if job.status == FAILED:
+        st.session_state.job_error = job.error
+    if job.status != DONE or job.result is None:
+        return  # 취소/실패: 화면은 그대로 둔다
+    if job.kind == "scenario":
+        st.session_state.scenario_data = job.result
+        st.session_state.evaluation_result = None
+        st.session_state.mentor_solution = None
+    elif job.kind == "evaluation":
+        text = job.result
+        st.session_state.evaluation_result = {"text": text}
+        st.session_state.mentor_solution = None
+        if parse_eval_score(text, None) is None:
+            return  # 점수가 없는 응답(통신 오류, 형식 이탈)은 기록에 남기지 않는다
+        if active.get("reused_feedback") is not None and text.strip() == clean_ai_response(active["reused_feedback"]).strip():
+            return  # 다시 평가했는데 이전 평가와 같으면 같은 기록을 또 남기지 않는다
+        st.session_state.history.append({
+            "Genre": st.session_state.scenario_data['genre'],
+            "Score": parse_eval_score(text),
+            "Risk": parse_risk_score(text),
+            "Crisis": st.session_state.scenario_data['public'],
+            "Cause": st.session_state.scenario_data['cause'],
+            "User_Action": active["action"],
+            "User_Notice": active["notice"],
+            "Feedback": text
+        })
+    elif job.kind == "mentor":
+        st.session_state.mentor_solution = job.result
+        st.session_state.evaluation_result = None
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_panel():
+    # 진행 중인 작업의 부분 결과를 보여 주고, 끝나면 결과를 반영한 뒤 전체 리런
+    active = st.session_state.active_job
+    if not active: return
+    job = get_job_executor().get(active["id"])
+    if job is None or job.finished:
+        st.session_state.active_job = None
+        if job is not None: apply_job_result(job, active)
+        st.rerun()
+    job.touch()
+    if active.get("prescore") is not None:
+        st.info(f"⚡ 가채점 **{active['prescore']}점** (키워드/길이/모범 공지 유사도 기준, AI 평가 전 참고용)")
+    st.caption("⏳ 대기열에서 순서를 기다리는 중..." if job.status == QUEUED else job.label)
+    if job.text: st.markdown(job.text)
+    if st.button("⏹ 요청 중단", key=f"cancel_{job.id}"):
+        cancel_active_job()
+        st.rerun()
+
+@st.fragment
+def ops_panel():
+    # 지표 정렬/캐시 통계 스캔은 패널을 켰을 때만, 새로고침은 이 조각만 다시 그린다
+    st.button("🔄 새로고침", key="ops_refresh")
+    ops_rows = get_metrics().summary()
+    if ops_rows:
+        st.markdown("**Provider 별**")
+        st.dataframe(ops_rows, hide_index=True)
+        st.markdown("**단계별**")
+        st.dataframe(get_metrics().phase_summary(), hide_index=True)
+    else:
+        st.caption("아직 AI 호출 기록이 없습니다.")
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        cache_stats = llm_cache.stats()
+        st.caption(f"응답 캐시: 적중률 {cache_stats['hit_rate']:.0%} ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), {cache_stats['entries']}건 저장")
+    job_stats = get_job_executor().stats()
+    st.caption(f"백그라운드 작업: 실행 {job_stats['running']}/{job_stats['workers']}, 대기 {job_stats['queued']}/{job_stats['max_queued']}")
+    health_rows = get_provider_health().snapshot()
+    if health_rows:
+        st.markdown("**Provider 상태** (연속 실패 / 우회 남은 시간)")
+        st.dataframe(health_rows, hide_index=True)
 
 # --- 사이드바 ---
 with st.sidebar:
     st.title("🔮 Crisis Ops v15")
     st.markdown("---")
-    provider = st.selectbox("🤖 AI 모델", ["Mistral AI", "Google Gemini", "OpenAI (GPT-4o)"])
+    provider_options = ["Mistral AI", "Google Gemini", "OpenAI (GPT-4o)"]
+    provider = st.selectbox("🤖 AI 모델", provider_options)
     
     # 미스트랄 키 발급 버튼
     if provider == "Mistral AI":
@@ -104,6 +216,18 @@ with st.sidebar:
         )
 
     api_key = st.text_input(f"{provider} API Key", type="password", placeholder="sk-...")
+
+    # 주 모델이 멈추거나 계속 실패할 때 같은 요청을 보낼 보조 모델 (선택)
+    with st.expander("🛟 헤지 / 페일오버", expanded=False):
+        backup_provider = st.selectbox("보조 AI 모델", ["사용 안 함"] + [p for p in provider_options if p != provider])
+        backup_key = ""
+        if backup_provider != "사용 안 함":
+            backup_key = st.text_input(f"{backup_provider} API Key (보조)", type="password", placeholder="sk-...")
+        hedge_delay = st.slider(
+            "첫 토큰 대기 시간 (초)", min_value=1.0, max_value=30.0, value=HEDGE_DELAY, step=0.5,
+            help="이 시간 안에 주 모델이 답을 시작하지 않으면 보조 모델에도 요청하고, 먼저 답하는 쪽을 씁니다."
+        )
+    fallbacks = [(backup_provider, backup_key)] if backup_key else None
     
     st.markdown("---")
     persona_mode = st.radio(
@@ -116,26 +240,38 @@ with st.sidebar:
     elif "창의적" in persona_mode: current_temp = 0.7 
     else: current_temp = 0.5
 
+    structured_eval = st.checkbox(
+        "🧩 구조화 평가 (JSON)", value=STRUCTURED_EVAL,
+        help="모델이 JSON 으로 답하게 해 점수/리스크를 먼저 보여 주고, 빠진 항목은 짧은 보완 요청으로 채웁니다."
+    )
+
     st.markdown("---")
     
     if st.session_state.history:
         st.markdown("### 🏆 시뮬레이션 기록")
-        df = pd.DataFrame(st.session_state.history)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Log')
-        
+        export_format = st.selectbox("💾 내보내기 형식", list(EXPORT_FORMATS))
+        ext, mime = EXPORT_FORMATS[export_format]
+        # 파일은 다운로드를 누를 때만 만든다.
         st.download_button(
-            label="💾 전체 기록 엑셀 다운로드",
-            data=output.getvalue(),
-            file_name="Crisis_Ops_Log.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label="💾 전체 기록 다운로드",
+            data=lazy_export(st.session_state.history, export_format, st.session_state.export_cache),
+            file_name=f"Crisis_Ops_Log.{ext}",
+            mime=mime,
+            on_click="ignore",
             help="내가 작성한 공지와 AI 피드백이 모두 저장됩니다."
         )
 
+    # 서버 전체의 AI 호출 지연/토큰/비용 (최근 호출 기준). 켰을 때만 집계한다.
+    if st.toggle("📈 Ops 패널", value=False):
+        ops_panel()
+
 # --- 메인 로직 ---
 st.title("🔮 미래 예지형 위기대응 시뮬레이터")
 
+if st.session_state.job_error:
+    st.error(f"AI 작업 실패: {st.session_state.job_error}")
+    st.session_state.job_error = None
+
 # [Phase 1] 설정 및 시작
 if not st.session_state.scenario_data:
     st.info("장르와 플랫폼, 그리고 훈련 난이도를 선택하세요.")
@@ -149,70 +285,23 @@ if not st.session_state.scenario_data:
         if not api_key:
             st.error("API 키를 입력해주세요.")
         else:
-            with st.spinner(f"⚠️ [{difficulty}] 등급의 상황을 시뮬레이션 중..."):
-                
-                hard_keywords = {
-                    "MMORPG": "경제 붕괴(골드 인플레), 아이템 복사 버그, 랭커/방송인 특혜 논란, 공성전 서버 다운, 작업장/매크로 방치, 강화 확률 조작 의혹, 특정 길드 편파 운영, 운영자 계정 남용",
-                    "수집형 RPG (가챠)": "매출 관련 이슈, 확률 조작(천장 미적용), 일러스트 검열/표절(트레이싱), 픽업 일정 통수(이중 픽업), 캐릭터 성능 잠수함 너프, 사료(보상) 차별, 한정 캐릭터 복각 논란",
-                    "FPS/TPS (슈팅)": "신종 핵(ESP/에임봇) 창궐, 넷코드(핑) 이슈, 밸런스 붕괴(사기총 방치), 맵 글리치(벽뚫기), 대회 공정성(방플), 티밍(어뷰징), 키보드/마우스 컨버터 논란",
-                    "MOBA (AOS)": "서버 팅김(재접 불가), 치명적 버그(스킬 쿨타임 0초), 트롤/패작/대리 제재 미흡, 신챔프 OP 논란, 매칭 시스템(다인큐) 불공정, 닷지 버그 악용, 오브젝트 버그",
-                    "스포츠/레이싱": "라이선스 만료(선수/차량 삭제), 물리 엔진 오류(차량 날아감/선수 끼임), P2W(현질) 밸런스 붕괴, 렉/핑으로 인한 승패 판정 오류, 랭킹 어뷰징, 카드깡 확률 논란",
-                    "퍼즐/캐주얼": "클리어 불가능한 스테이지(난이도 조절 실패), 과도한 광고 노출(플레이 방해), 타 게임 리소스 도용/표절, 데이터 초기화/백섭, 소셜 기능(하트 보내기) 오류, 랭킹 조작",
-                    "서브컬처 비주얼 노벨": "스토리/대사 사상 검증(혐오 표현), 번역 퀄리티(오역/밈 남발), 성우 논란(계약 해지), 굿즈 퀄리티 불량, 운영진의 유저 비하 발언, 설정 붕괴"
-                }
-
-                if "어려움" in difficulty:
-                    level_instruction = (
-                        "서비스의 존폐가 걸린 **심각한 위기**를 생성해라. 유저들의 분노가 극에 달해 있다. "
-                        "단, **'수습 불가능한 수치'(예: 유저 90% 이탈, 전수 조사 결과 100% 표절 등)는 피해라.** "
-                        "CM의 역량에 따라 **회생할 수 있는 여지**를 아주 조금은 남겨둬라."
-                    )
-                    raw_triggers = hard_keywords.get(genre, "치명적인 버그, 운영 신뢰도 붕괴")
-                elif "보통" in difficulty:
-                    level_instruction = "유저들이 큰 불편을 겪어 불만을 표출하지만, **적절한 사과와 보상으로 충분히 수습 가능한** 수준의 위기를 생성해라."
-                    raw_triggers = "점검 시간 연장, 툴팁/텍스트 오기재, 이벤트 보상 미지급, 경미한 밸런스 불만, 번역 어색함"
-                else:
-                    level_instruction = "신입 CM이 처리할 수 있는 **가벼운 해프닝이나 단순 실수**를 생성해라."
-                    raw_triggers = "단순 오탈자, 공지사항 링크 실수, 10분 내외의 접속 불안정, 이벤트 날짜 표기 혼동"
-
-                trigger_list = [t.strip() for t in raw_triggers.split(',')]
-                pick_count = random.choices([0, 1, 2, 3], weights=[20, 40, 30, 10])[0]
-                
-                if pick_count == 0: selected_triggers = "지정된 키워드 없음. (창의적으로 생성)"
-                else: selected_triggers = ", ".join(random.sample(trigger_list, min(pick_count, len(trigger_list))))
+            pool = get_scenario_pool()
+            scenario = pool.pop(provider, api_key, current_temp, genre, platform, difficulty)
+            # 다음 라운드용 시나리오를 백그라운드에서 미리 채워 둔다.
+            pool.refill(provider, api_key, current_temp, genre, platform, difficulty)
 
-                random_seed = random.randint(1, 10000)
-
-                sys_msg_public = (
-                    f"너는 게임 운영 시뮬레이터의 상황 브리핑 AI다. **'{genre}'({platform})** 게임의 위기 상황을 보고해라.\n"
-                    f"난이도: **'{difficulty}'**\n"
-                    f"지침: {level_instruction}\n"
-                    f"이번 시나리오의 핵심 소재: **[{selected_triggers}]**\n\n"
-                    f"**[필수 출력 형식]**\n"
-                    f"다음 3가지 항목만 포함해서 마크다운으로 작성해라:\n"
-                    f"1. **사건 개요 (Background)**: 무엇이 문제인가? (구체적인 수치 포함)\n"
-                    f"2. **유저 반응 (Reactions)**: 커뮤니티 여론, 주요 불만 내용, 시위 여부 등\n"
-                    f"3. **현재 지표 (Current Status)**: 평점, 동접자 수, 환불 요청 건수 등\n\n"
-                    f"**[절대 금지 사항]**\n"
-                    f"- 게임사의 대응(공지, 보상, 해명 등)을 절대 미리 적지 마라.\n"
-                    f"- 결과(Outcome)나 미래 예측을 적지 마라.\n"
-                    f"- 오직 '발생한 상황'까지만 보고해라."
-                )
-                user_msg_public = "지금 발생한 위기 상황을 브리핑해. (형식 엄수)"
-                public_text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg_public, user_msg_public, temperature=current_temp))
-
-                sys_msg_secret = (
-                    "너는 게임 개발팀의 테크니컬 리드(TD)다. 발생한 위기 상황의 **기술적/내부적 진짜 원인**을 보고해라.\n"
-                    "감정을 배제하고 **건조하고 논리적**으로 사실만 서술해라.\n"
-                    "유저들의 추측이 맞을 수도 있고, 전혀 다른 엉뚱한 개발자 실수일 수도 있다."
-                )
-                user_msg_secret = f"[상황]\n{public_text}\n\n위 상황의 진짜 내부 원인(Secret)을 3줄 내외로 요약 보고해."
-                secret_text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg_secret, user_msg_secret, temperature=0.3))
-                
-                st.session_state.scenario_data = {"public": public_text, "cause": secret_text, "genre": genre}
+            if scenario is not None:
+                cancel_active_job()
+                st.session_state.scenario_data = scenario
                 st.session_state.evaluation_result = None
                 st.session_state.mentor_solution = None 
                 st.rerun()
+            # 풀이 비어 있으면 백그라운드 작업으로 직접 생성 (스트리밍)
+            elif start_job("scenario", run_scenario_job, provider, api_key, current_temp, genre, platform, difficulty, fallbacks, hedge_delay):
+                st.rerun()
+
+    if st.session_state.active_job:
+        job_panel()
 
 # [Phase 2 & 3] 대응 및 평가
 else:
@@ -251,11 +340,16 @@ else:
                     give_up = st.form_submit_button("🏃‍♂️ 사표 쓰고 탈주하기 (멘토 찬스)", use_container_width=True)
             
             if st.button("🔄 초기화 (New Scenario)", use_container_width=True):
+                cancel_active_job()
                 st.session_state.scenario_data = {}
                 st.session_state.evaluation_result = None
                 st.session_state.mentor_solution = None
                 st.rerun()
 
+        # 진행 중인 평가/멘토 작업 (기다리는 동안에도 상황판은 그대로 볼 수 있다)
+        if st.session_state.active_job:
+            job_panel()
+
         # 2. 결과 출력 (폼 아래에 배치)
         
         # [Case A] 평가 결과
@@ -269,6 +363,14 @@ else:
             
             st.markdown("---")
             result_box(f"📊 **대응 평가 결과** (점수: {score}점)")
+            if res.get('reused'):
+                st.caption("♻️ 이 시나리오에 같은 답안을 이미 평가받아, AI 를 다시 부르지 않고 이전 평가를 보여 드립니다.")
+                if st.button("🔁 다시 평가", help="이전 평가를 쓰지 않고 AI 에게 새로 평가받습니다."):
+                    if not api_key: st.error("키 없음")
+                    elif start_job("evaluation", run_eval_job, provider, api_key, current_temp, st.session_state.scenario_data,
+                                   res["action"], res["notice"], fallbacks, hedge_delay, structured_eval, False,
+                                   action=res["action"], notice=res["notice"], reused_feedback=res["text"]):
+                        st.rerun()
             st.markdown(cleaned_feedback)
 
         # [Case B] 멘토 솔루션
@@ -294,57 +396,23 @@ else:
             if not api_key: st.error("키 없음")
             elif not action or not notice: st.warning("내용 입력 필요")
             else:
-                with st.spinner("🔮 미래의 타임라인을 계산 중입니다..."):
-                    sys_msg = (
-                        "너는 게임 운영의 신이자, 친절한 멘토다. CM(사용자)의 대응을 평가해라. "
-                        "**[말투 가이드]**\n"
-                        "- 딱딱한 보고서체 금지. **부드럽고 정중한 해요체(~입니다, ~하셨군요)** 사용.\n"
-                        "- 사용자를 격려하면서도, 고쳐야 할 점은 명확하게 지적.\n\n"
-                        "**[출력 형식]**\n"
-                        "[[점수: 0~100]]\n[[리스크: 0~100]]\n\n"
-                        "## 🔮 미래 시뮬레이션\n"
-                        "**🌞 [희망편]:**\n**⛈️ [절망편]:**\n\n"
-                        "## 📝 멘토의 피드백\n"
-                        "**💬 총평:**\n**✍️ [첨삭 지도]:** (공지사항 문구 수정 제안)"
-                    )
-                    user_msg = f"""
-                    [상황] {st.session_state.scenario_data['public']}
-                    [진실] {st.session_state.scenario_data['cause']}
-                    [조치] {action}
-                    [공지] {notice}
-                    """
-                    text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=current_temp))
-                    st.session_state.evaluation_result = {"text": text}
+                # AI 평가 전에 로컬 가채점: 미완성 답안은 돌려보내고, 같은 답안의 재제출은 이전 평가를 재사용
+                pre = get_prescorer(st.session_state.history, st.session_state.prescore_cache).score(
+                    st.session_state.scenario_data['public'], action, notice
+                )
+                if pre["reject"]:
+                    st.warning(f"⚡ 가채점 {pre['score']}점 — 평가 전에 보완이 필요합니다.\n\n" + "\n".join(f"- {issue}" for issue in pre["issues"]))
+                elif pre["duplicate"]:
+                    cancel_active_job()
+                    st.session_state.evaluation_result = {"text": pre["duplicate"]["Feedback"], "reused": True,
+                                                           "action": action, "notice": notice}
                     st.session_state.mentor_solution = None
-                    
-                    st.session_state.history.append({
-                        "Genre": st.session_state.scenario_data['genre'],
-                        "Score": parse_eval_score(text),
-                        "Risk": parse_risk_score(text),
-                        "Crisis": st.session_state.scenario_data['public'],
-                        "User_Action": action,
-                        "User_Notice": notice,
-                        "Feedback": text
-                    })
-                    st.rerun() # 결과 표시를 위해 리런
+                    st.rerun()
+                elif start_job("evaluation", run_eval_job, provider, api_key, current_temp, st.session_state.scenario_data,
+                               action, notice, fallbacks, hedge_delay, structured_eval, action=action, notice=notice, prescore=pre["score"]):
+                    st.rerun() # 진행 상황 표시를 위해 리런
 
         if give_up:
             if not api_key: st.error("키 없음")
-            else:
-                with st.spinner("🏃‍♂️ 사표 수리 중... (멘토가 대신 수습하는 중)"):
-                    sys_msg = (
-                        "너는 업계 최고의 위기 관리 전문가다. 현재 상황과 내부 진실을 고려하여 **가장 이상적인 대응책(정답)**을 제시해라.\n"
-                        "**[필수 포함 내용]**\n"
-                        "1. **추천 내부 조치:** 개발팀/유관부서에 지시해야 할 현실적인 액션 아이템.\n"
-                        "2. **추천 공지사항:** 유저의 분노를 잠재우고 신뢰를 회복할 수 있는 완벽한 사과문(또는 안내문) 초안."
-                    )
-                    user_msg = f"""
-                    [현재 상황] {st.session_state.scenario_data['public']}
-                    [내부 진실] {st.session_state.scenario_data['cause']}
-                    
-                    이 상황을 타개할 모범 답안을 작성해줘.
-                    """
-                    sol_text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=0.5))
-                    st.session_state.mentor_solution = sol_text
-                    st.session_state.evaluation_result = None
-                    st.rerun() # 결과 표시를 위해 리런
+            elif start_job("mentor", run_mentor_job, provider, api_key, st.session_state.scenario_data, fallbacks, hedge_delay):
+                st.rerun() # 진행 상황 표시를 위해 리런
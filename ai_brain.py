@@ -0,0 +1,633 @@
+import os
+import re
+import queue
+import random
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+
+import httpx
+import openai
+import requests
+import streamlit as st
+from openai import OpenAI
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import client as genai_client
+from mistralai import Mistral
+
+from llm_cache import LLMCache, get_llm_cache
+from metrics import get_metrics
+from prompts import max_tokens_for, output_cap
+
+# --- 모델 / 통신 설정 (환경변수로 조정 가능) ---
+MODELS = {
+    "OpenAI (GPT-4o)": "gpt-4o",
+    "Google Gemini": "gemini-2.5-flash",
+    "Mistral AI": "mistral-small-latest",
+}
+
+AI_TIMEOUT = float(os.getenv("CRISIS_AI_TIMEOUT", "60"))          # 호출당 타임아웃(초)
+AI_MAX_RETRIES = int(os.getenv("CRISIS_AI_MAX_RETRIES", "3"))     # 429/5xx 재시도 횟수
+AI_BACKOFF_BASE = float(os.getenv("CRISIS_AI_BACKOFF_BASE", "1.0"))
+AI_BACKOFF_MAX = float(os.getenv("CRISIS_AI_BACKOFF_MAX", "20"))
+CLIENT_IDLE_TTL = float(os.getenv("CRISIS_CLIENT_IDLE_TTL", "1800"))  # 키가 이 시간 동안 안 쓰이면 클라이언트 정리
+CLIENT_MAX_ENTRIES = int(os.getenv("CRISIS_CLIENT_MAX_ENTRIES", "256"))
+HEDGE_DELAY = float(os.getenv("CRISIS_HEDGE_DELAY", "6"))             # 이 시간 안에 첫 토큰이 없으면 보조 provider 에도 요청
+HEALTH_MAX_FAILURES = int(os.getenv("CRISIS_HEALTH_MAX_FAILURES", "3"))  # 연속 실패가 이만큼 쌓이면 우회
+HEALTH_COOLDOWN = float(os.getenv("CRISIS_HEALTH_COOLDOWN", "60"))     # 우회 유지 시간(초). 지나면 다시 시도해 본다
+
+# 로컬 스텁 서버/프록시로 보낼 때만 지정 (벤치마크용). 비어 있으면 각 SDK 기본 주소를 쓴다.
+BASE_URLS = {
+    "OpenAI (GPT-4o)": os.getenv("CRISIS_OPENAI_BASE_URL"),     # 예: http://127.0.0.1:8765/v1
+    "Google Gemini": os.getenv("CRISIS_GEMINI_BASE_URL"),       # 예: http://127.0.0.1:8765 (REST 전송)
+    "Mistral AI": os.getenv("CRISIS_MISTRAL_BASE_URL"),         # 예: http://127.0.0.1:8765
+}
+
+ERROR_PREFIX = "⚠ AI 통신 오류 발생"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+# --- 텍스트 정제 함수 ---
+def clean_ai_response(text):
+    if not text: return ""
+    text = text.strip()
+    text = re.sub(r"^```[a-zA-Z]*\n", "", text)
+    text = re.sub(r"\n```$", "", text)
+    return text.strip()
+
+def is_ai_error(text):
+    return ERROR_PREFIX in (text or "")
+
+
+# --- 클라이언트 풀 ---
+class ClientPool:
+    """(provider, api_key) 별로 keep-alive 클라이언트를 하나씩 유지한다.
+
+    오래 안 쓰인 키나 최대 개수를 넘는 키는 LRU 순으로 정리한다.
+    """
+
+    def __init__(self, idle_ttl=CLIENT_IDLE_TTL, max_entries=CLIENT_MAX_ENTRIES):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._clients = OrderedDict()  # key -> [client, last_used]
+        self._lock = threading.Lock()
+
+    def get(self, provider, api_key, timeout):
+        key = (provider, hashlib.sha256(api_key.encode()).hexdigest(), timeout)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = [_make_client(provider, api_key, timeout), now]
+                self._clients[key] = entry
+            entry[1] = now
+            self._clients.move_to_end(key)
+            evicted = self._evict(now)
+        for client in evicted:
+            _close_client(client)
+        return entry[0]
+
+    def _evict(self, now):
+        evicted = []
+        while self._clients:
+            key, (client, last_used) = next(iter(self._clients.items()))
+            if len(self._clients) > self.max_entries or now - last_used > self.idle_ttl:
+                del self._clients[key]
+                evicted.append(client)
+            else:
+                break
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            clients = [c for c, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            _close_client(client)
+
+
+def _make_client(provider, api_key, timeout):
+    # SDK 자체 재시도는 끄고 call_ai_brain 의 백오프로 일원화한다.
+    base_url = BASE_URLS.get(provider)
+    if provider == "OpenAI (GPT-4o)":
+        return OpenAI(api_key=api_key, timeout=timeout, max_retries=0, base_url=base_url)
+    elif provider == "Google Gemini":
+        # genai.configure() 는 전역 상태라 세션끼리 키가 섞인다 -> 키마다 별도 매니저 사용
+        manager = genai_client._ClientManager()
+        if base_url:
+            manager.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": base_url})
+        else:
+            manager.configure(api_key=api_key)
+        return manager.get_default_client("generative")
+    elif provider == "Mistral AI":
+        return Mistral(api_key=api_key, timeout_ms=int(timeout * 1000), server_url=base_url)
+    raise ValueError(f"알 수 없는 provider: {provider}")
+
+
+def _close_client(client):
+    try:
+        if hasattr(client, "close"):               # OpenAI
+            client.close()
+        elif hasattr(client, "transport"):         # Gemini (gapic)
+            client.transport.close()
+        elif hasattr(client, "__exit__"):          # Mistral
+            client.__exit__(None, None, None)
+    except Exception:
+        pass
+
+
+@st.cache_resource
+def get_client_pool():
+    # Streamlit 재실행/세션 간에 공유되는 프로세스 단일 풀
+    return ClientPool()
+
+
+# --- provider 상태 ---
+class ProviderHealth:
+    """provider 별 연속 실패(오류, 타임아웃, 첫 토큰 지연)를 센다.
+
+    max_failures 번 연속 실패하면 cooldown 동안 '우회' 상태로 두고, 보조 provider 가
+    있는 호출은 그쪽을 먼저 쓴다. cooldown 이 지나면 다시 한 번 시도해 보고,
+    성공하면 카운터를 0 으로 되돌린다.
+    """
+
+    def __init__(self, max_failures=HEALTH_MAX_FAILURES, cooldown=HEALTH_COOLDOWN):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._failures = {}       # provider -> 연속 실패 수
+        self._down_until = {}     # provider -> monotonic 시각
+        self._lock = threading.Lock()
+
+    def is_healthy(self, provider):
+        with self._lock:
+            return time.monotonic() >= self._down_until.get(provider, 0)
+
+    def record_success(self, provider):
+        with self._lock:
+            self._failures.pop(provider, None)
+            self._down_until.pop(provider, None)
+
+    def record_failure(self, provider):
+        with self._lock:
+            count = self._failures.get(provider, 0) + 1
+            self._failures[provider] = count
+            if count >= self.max_failures:
+                self._down_until[provider] = time.monotonic() + self.cooldown
+
+    def order(self, routes):
+        # 건강한 경로를 앞으로 (같은 상태끼리는 원래 순서 유지)
+        return sorted(routes, key=lambda route: not self.is_healthy(route[0]))
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {"provider": provider, "failures": count,
+                 "down_s": round(max(0.0, self._down_until.get(provider, 0) - now), 1)}
+                for provider, count in sorted(self._failures.items())
+            ]
+
+
+@st.cache_resource
+def get_provider_health():
+    return ProviderHealth()
+
+
+# --- 재시도 판단 ---
+def _status_code(e):
+    for attr in ("status_code", "code"):
+        value = getattr(e, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None)
+
+
+# 상태 코드가 없는 네트워크 오류(연결 거부/끊김, 타임아웃, 프로토콜 오류). SDK 마다 감싸는 방식이 달라 모두 나열한다:
+# Mistral 은 httpx 예외를 그대로, OpenAI 는 APIConnectionError/APITimeoutError 로 감싸서,
+# Gemini REST 전송은 requests 예외나 google.api_core 예외로 올린다.
+TRANSIENT_ERRORS = (
+    httpx.TransportError,
+    openai.APIConnectionError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.RetryError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class EmptyCompletionError(RuntimeError):
+    """응답은 정상으로 끝났는데 본문이 비어 있음 (출력 상한을 생각 토큰이 다 쓴 경우 등)."""
+
+
+def _is_retryable(e):
+    status = _status_code(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(e, TRANSIENT_ERRORS) or isinstance(e, EmptyCompletionError)
+
+
+def _backoff_delay(attempt):
+    # full jitter: 0 ~ min(max, base * 2^attempt)
+    return random.uniform(0, min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * (2 ** attempt)))
+
+
+# --- provider 별 단일 요청 ---
+def _json_options(provider, json_schema):
+    # JSON 응답 모드 옵션. OpenAI 만 스키마를 강제하고, Gemini/Mistral 은 JSON 모드만 켠 채
+    # 키 순서는 프롬프트로 지정한다 (Gemini 스키마는 키를 알파벳순으로 내보내 점수가 늦게 온다).
+    if not json_schema:
+        return {}
+    if provider == "OpenAI (GPT-4o)":
+        schema = {k: v for k, v in json_schema.items() if k != "title"}
+        return {"response_format": {"type": "json_schema", "json_schema": {
+            "name": json_schema.get("title", "response"), "strict": True,
+            "schema": {**schema, "additionalProperties": False},
+        }}}
+    elif provider == "Google Gemini":
+        return {"response_mime_type": "application/json"}
+    elif provider == "Mistral AI":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+# usage 는 호출자가 넘기는 dict 로, 응답의 토큰 사용량(prompt_tokens / completion_tokens)을 채운다.
+def _request(client, provider, system_role, user_prompt, temperature, max_tokens, timeout, json_schema, usage):
+    model = MODELS[provider]
+    max_tokens = output_cap(provider, max_tokens)
+    if provider == "OpenAI (GPT-4o)":
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **_json_options(provider, json_schema)
+        )
+        _read_usage(usage, response.usage, "prompt_tokens", "completion_tokens")
+        return response.choices[0].message.content
+
+    elif provider == "Google Gemini":
+        gemini = genai.GenerativeModel(model)
+        gemini._client = client
+        response = gemini.generate_content(
+            f"{system_role}\n\n[상황/요청]\n{user_prompt}",
+            generation_config=genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens, **_json_options(provider, json_schema)),
+            request_options={"timeout": timeout}
+        )
+        _read_usage(usage, response.usage_metadata, "prompt_token_count", "candidates_token_count")
+        if not response.parts:  # response.text 는 본문이 없으면 ValueError
+            finish = response.candidates[0].finish_reason if response.candidates else None
+            raise EmptyCompletionError(f"{provider} 응답에 본문이 없습니다 (finish_reason={finish})")
+        return response.text
+
+    elif provider == "Mistral AI":
+        response = client.chat.complete(
+            model=model,
+            messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **_json_options(provider, json_schema)
+        )
+        _read_usage(usage, response.usage, "prompt_tokens", "completion_tokens")
+        return response.choices[0].message.content
+
+    raise ValueError(f"알 수 없는 provider: {provider}")
+
+
+def _request_stream(client, provider, system_role, user_prompt, temperature, max_tokens, timeout, json_schema, usage):
+    # 제너레이터가 중간에 닫히면(with 블록 종료) HTTP 스트림도 함께 닫힌다.
+    model = MODELS[provider]
+    max_tokens = output_cap(provider, max_tokens)
+    if provider == "OpenAI (GPT-4o)":
+        with client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **_json_options(provider, json_schema),
+            stream_options={"include_usage": True}
+        ) as stream:
+            for chunk in stream:
+                if chunk.usage:
+                    _read_usage(usage, chunk.usage, "prompt_tokens", "completion_tokens")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    elif provider == "Google Gemini":
+        gemini = genai.GenerativeModel(model)
+        gemini._client = client
+        response = gemini.generate_content(
+            f"{system_role}\n\n[상황/요청]\n{user_prompt}",
+            generation_config=genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens, **_json_options(provider, json_schema)),
+            request_options={"timeout": timeout},
+            stream=True
+        )
+        for chunk in response:
+            _read_usage(usage, chunk.usage_metadata, "prompt_token_count", "candidates_token_count")
+            if chunk.parts:
+                yield chunk.text
+
+    elif provider == "Mistral AI":
+        with client.chat.stream(
+            model=model,
+            messages=[{"role": "system", "content": system_role}, {"role": "user", "content": user_prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **_json_options(provider, json_schema)
+        ) as stream:
+            for event in stream:
+                if event.data.usage:
+                    _read_usage(usage, event.data.usage, "prompt_tokens", "completion_tokens")
+                delta = event.data.choices[0].delta.content if event.data.choices else None
+                if delta:
+                    yield delta
+
+    else:
+        raise ValueError(f"알 수 없는 provider: {provider}")
+
+
+def _read_usage(usage, source, prompt_field, completion_field):
+    # 스트리밍에서는 마지막 청크의 값이 최종 누적치다.
+    if source is None:
+        return
+    prompt_tokens = getattr(source, prompt_field, None)
+    completion_tokens = getattr(source, completion_field, None)
+    if prompt_tokens:
+        usage["prompt_tokens"] = prompt_tokens
+    if completion_tokens:
+        usage["completion_tokens"] = completion_tokens
+
+
+# --- 재시도 루프 ---
+# stats 에는 재시도 횟수(retries), 토큰 사용량, 최종 오류(error)가 기록된다.
+def _call_with_retries(provider, api_key, system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema, stats):
+    attempt = 0
+    while True:
+        try:
+            client = get_client_pool().get(provider, api_key, timeout)
+            text = _request(client, provider, system_role, user_prompt, temperature, max_tokens, timeout, json_schema, stats)
+            if not (text or "").strip():
+                raise EmptyCompletionError(f"{provider} 응답에 본문이 없습니다")
+            return text
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                stats["error"] = type(e).__name__
+                return f"{ERROR_PREFIX}: {str(e)}"
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+            stats["retries"] = attempt
+
+
+def _stream_with_retries(provider, api_key, system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema, stats):
+    # 첫 토큰 이전의 오류만 재시도하고, 이미 출력이 나간 뒤의 오류는 오류 문구로 마무리한다.
+    attempt = 0
+    while True:
+        started = False
+        try:
+            client = get_client_pool().get(provider, api_key, timeout)
+            for chunk in _request_stream(client, provider, system_role, user_prompt, temperature, max_tokens, timeout, json_schema, stats):
+                started = True
+                yield chunk
+            if not started:
+                raise EmptyCompletionError(f"{provider} 응답에 본문이 없습니다")
+            return
+        except Exception as e:
+            if started or attempt >= max_retries or not _is_retryable(e):
+                stats["error"] = type(e).__name__
+                prefix = "\n\n" if started else ""
+                yield f"{prefix}{ERROR_PREFIX}: {str(e)}"
+                return
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+            stats["retries"] = attempt
+
+
+# --- 헤지 / 페일오버 ---
+_FAILED = object()   # 첫 토큰 전에 실패한 경로
+_DONE = object()     # 경로의 스트림이 끝남
+
+
+class _HedgeLeg:
+    """헤지 경주에 나간 경로 하나. 별도 스레드가 스트림을 읽어 공용 큐로 넘긴다.
+
+    cancel() 하면 다음 청크를 받는 즉시 스트림을 닫는다. 첫 토큰 전에 멈춘 요청은
+    끊을 수 없어서 호출 타임아웃이 지나야 스레드가 끝나고, 그 결과는 버려진다.
+    """
+
+    def __init__(self, provider, api_key, request_args, phase, events):
+        self.provider = provider
+        self.stats = {"retries": 0}
+        self.started_at = time.monotonic()
+        self.ttft = None
+        self.done = False
+        self._cancelled = threading.Event()
+        self._events = events
+        threading.Thread(target=self._run, args=(api_key, request_args, phase),
+                         name=f"hedge-{provider}", daemon=True).start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _run(self, api_key, request_args, phase):
+        stream = _stream_with_retries(self.provider, api_key, *request_args, self.stats)
+        try:
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    break
+                if self.ttft is None:
+                    if "error" in self.stats:
+                        # 오류 문구는 모든 경로가 실패했을 때 대신 보여 준다.
+                        self._events.put((self, _FAILED, chunk))
+                        return
+                    self.ttft = time.monotonic() - self.started_at
+                self._events.put((self, chunk, None))
+        finally:
+            stream.close()
+            if self._cancelled.is_set() and "error" not in self.stats:
+                # 첫 토큰도 못 내고 진 경로는 지연 실패로 센다.
+                self.stats["error"] = "HedgeTimeout" if self.ttft is None else "Cancelled"
+            _record(self.provider, phase, self.started_at, self.stats, ttft=self.ttft, stream=True)
+            self._events.put((self, _DONE, None))
+
+
+def _routes(provider, api_key, fallbacks):
+    # 주 경로 + 보조 경로 (provider 중복과 키 없는 경로는 제외). 상태가 나쁜 provider 는 뒤로 보낸다.
+    routes, seen = [], set()
+    for route in [(provider, api_key), *(fallbacks or ())]:
+        if route[1] and route[0] not in seen:
+            seen.add(route[0])
+            routes.append(route)
+    return get_provider_health().order(routes) if len(routes) > 1 else routes
+
+
+def _hedged_stream(routes, request_args, hedge_delay, phase, stats):
+    # 앞 경로가 hedge_delay 안에 첫 토큰을 못 내면 다음 경로도 띄우고, 먼저 첫 토큰을 낸 쪽이
+    # 이긴다 (나머지는 취소). 첫 토큰 전에 실패한 경로는 기다리지 않고 바로 다음 경로로 넘어간다.
+    # 각 경로는 스스로 계측을 남기고, stats 에는 이긴 경로의 값과 provider 를 옮겨 담는다.
+    events = queue.Queue()
+    pending = list(routes)
+    legs = []
+    winner = None
+    error_text = None
+
+    def launch():
+        provider, api_key = pending.pop(0)
+        legs.append(_HedgeLeg(provider, api_key, request_args, phase, events))
+        return time.monotonic() + hedge_delay
+
+    deadline = launch()
+    try:
+        while True:
+            if winner is None and all(leg.done for leg in legs):
+                if not pending:
+                    break
+                deadline = launch()
+                continue
+            wait = max(0.0, deadline - time.monotonic()) if winner is None and pending else None
+            try:
+                leg, chunk, error = events.get(timeout=wait)
+            except queue.Empty:
+                deadline = launch()
+                continue
+            if winner is not None and leg is not winner:
+                continue
+            if chunk is _FAILED:
+                leg.done = True
+                error_text = error
+            elif chunk is _DONE:
+                leg.done = True
+                if leg is winner or (winner is None and "error" not in leg.stats):
+                    winner = leg  # 빈 응답으로 끝난 경우
+                    break
+            else:
+                if winner is None:
+                    winner = leg
+                    for other in legs:
+                        if other is not leg:
+                            other.cancel()
+                yield chunk
+    finally:
+        for leg in legs:
+            leg.cancel()
+
+    if winner is None:
+        stats.update(legs[-1].stats)
+        yield error_text or f"{ERROR_PREFIX}: 응답한 provider 가 없습니다."
+        return
+    stats.update(winner.stats)
+    stats["provider"] = winner.provider
+
+
+# --- AI 호출 함수 ---
+def _cache_key(provider, system_role, user_prompt, temperature, max_tokens):
+    return LLMCache.make_key(provider, MODELS.get(provider), temperature, system_role, user_prompt, max_tokens)
+
+
+def _record(provider, phase, started_at, stats, ttft=None, cached=False, stream=False):
+    try:
+        get_metrics().record(
+            provider, MODELS.get(provider), phase, time.monotonic() - started_at, ttft_s=ttft,
+            prompt_tokens=stats.get("prompt_tokens"), completion_tokens=stats.get("completion_tokens"),
+            retries=stats.get("retries", 0), error=stats.get("error"), cached=cached, stream=stream
+        )
+    except Exception:
+        pass  # 계측 실패로 호출 결과를 잃지 않는다
+    if not cached:
+        # 소비자가 닫은 스트림은 provider 탓이 아니므로 세지 않는다.
+        error = stats.get("error")
+        if error is None:
+            get_provider_health().record_success(provider)
+        elif error != "Cancelled":
+            get_provider_health().record_failure(provider)
+
+
+def call_ai_brain(provider, api_key, system_role, user_prompt, temperature=0.5,
+                  max_tokens=None, timeout=None, max_retries=None, use_cache=True, phase=None,
+                  fallbacks=None, hedge_delay=None, json_schema=None):
+    # use_cache=False 면 디스크 캐시를 건너뛴다 (매번 달라야 하는 생성 요청용).
+    # phase 는 계측용 단계 이름이다 (briefing / secret / evaluation / mentor).
+    # fallbacks 에 [(provider, api_key), ...] 를 주면 헤지/페일오버 모드로 돈다 (_hedged_stream 참고).
+    # 이때는 첫 토큰 기준으로 경주시키기 위해 내부적으로 스트리밍 요청을 쓴다.
+    # max_tokens 를 생략하면 phase 별 출력 예산(prompts.PHASE_MAX_TOKENS)을 쓴다.
+    # json_schema 를 주면 provider 의 JSON 응답 모드를 켠다 (_json_options 참고).
+    timeout = AI_TIMEOUT if timeout is None else timeout
+    max_tokens = max_tokens_for(phase) if max_tokens is None else max_tokens
+    max_retries = AI_MAX_RETRIES if max_retries is None else max_retries
+    started_at = time.monotonic()
+    stats = {"retries": 0}
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        key = _cache_key(provider, system_role, user_prompt, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            _record(provider, phase, started_at, stats, cached=True)
+            return cached
+
+    routes = _routes(provider, api_key, fallbacks)
+    if len(routes) > 1:
+        hedge_delay = HEDGE_DELAY if hedge_delay is None else hedge_delay
+        request_args = (system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema)
+        text = "".join(_hedged_stream(routes, request_args, hedge_delay, phase, stats))
+        provider = stats.get("provider", provider)
+    else:
+        text = _call_with_retries(provider, api_key, system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema, stats)
+        _record(provider, phase, started_at, stats)
+    if cache is not None and text and not is_ai_error(text):
+        # 보조 provider 가 답했으면 그 provider 의 키로 저장한다.
+        key = _cache_key(provider, system_role, user_prompt, temperature, max_tokens)
+        cache.put(key, text, provider, MODELS.get(provider))
+    return text
+
+
+def stream_ai_brain(provider, api_key, system_role, user_prompt, temperature=0.5,
+                    max_tokens=None, timeout=None, max_retries=None, use_cache=True, phase=None,
+                    fallbacks=None, hedge_delay=None, json_schema=None):
+    # call_ai_brain 의 스트리밍 버전. 텍스트 조각을 순서대로 yield 한다.
+    # 캐시에 있으면 전체 텍스트를 한 번에 내보내고, 끝까지 받은 정상 응답만 캐시에 저장한다.
+    timeout = AI_TIMEOUT if timeout is None else timeout
+    max_tokens = max_tokens_for(phase) if max_tokens is None else max_tokens
+    max_retries = AI_MAX_RETRIES if max_retries is None else max_retries
+    started_at = time.monotonic()
+    stats = {"retries": 0}
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        key = _cache_key(provider, system_role, user_prompt, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            _record(provider, phase, started_at, stats, ttft=time.monotonic() - started_at, cached=True, stream=True)
+            yield cached
+            return
+
+    chunks = []
+    routes = _routes(provider, api_key, fallbacks)
+    if len(routes) > 1:
+        hedge_delay = HEDGE_DELAY if hedge_delay is None else hedge_delay
+        request_args = (system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema)
+        for chunk in _hedged_stream(routes, request_args, hedge_delay, phase, stats):
+            chunks.append(chunk)
+            yield chunk
+        provider = stats.get("provider", provider)
+    else:
+        ttft = None
+        completed = False
+        try:
+            for chunk in _stream_with_retries(provider, api_key, system_role, user_prompt, temperature, max_tokens, timeout, max_retries, json_schema, stats):
+                if ttft is None:
+                    ttft = time.monotonic() - started_at
+                chunks.append(chunk)
+                yield chunk
+            completed = True
+        finally:
+            if not completed and "error" not in stats:
+                stats["error"] = "Cancelled"  # 소비자가 스트림을 중간에 닫음
+            _record(provider, phase, started_at, stats, ttft=ttft, stream=True)
+    text = "".join(chunks)
+    if cache is not None and text and not is_ai_error(text):
+        key = _cache_key(provider, system_role, user_prompt, temperature, max_tokens)
+        cache.put(key, text, provider, MODELS.get(provider))
@@ -0,0 +1,203 @@
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+
+import pandas as pd
+
+from ai_brain import MODELS, call_ai_brain, clean_ai_response, is_ai_error
+from evaluation import EVAL_SCHEMA, EvalStreamParser, build_eval_prompt, finish_structured_eval, parse_eval_score, parse_risk_score
+
+# --- 배치 채점 설정 (provider 별 동시 요청 수 / 분당 요청 수) ---
+PROVIDER_CONCURRENCY = {"OpenAI (GPT-4o)": 8, "Google Gemini": 4, "Mistral AI": 2}
+PROVIDER_RPM = {"OpenAI (GPT-4o)": 300, "Google Gemini": 60, "Mistral AI": 60}
+
+# Crisis_Ops_Log.xlsx 와 같은 컬럼 이름을 쓴다. Cause 는 없어도 된다.
+REQUIRED_COLUMNS = ["Crisis", "User_Action", "User_Notice"]
+
+
+class RateLimiter:
+    """분당 요청 수를 균등 간격으로 제한하는 asyncio 리미터."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# --- 입출력 ---
+def load_rows(path):
+    if path.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path)
+    else:
+        df = pd.read_csv(path)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"필수 컬럼 누락: {', '.join(missing)}")
+    df = df.fillna("")
+    rows = []
+    for index, record in enumerate(df.to_dict("records")):
+        # 행 번호 + 내용 해시: 입력 파일이 바뀌면 다른 행으로 취급한다.
+        digest = hashlib.sha1(
+            "\x1f".join(str(record.get(c, "")) for c in ["Crisis", "Cause", "User_Action", "User_Notice"]).encode()
+        ).hexdigest()[:12]
+        record["Row_ID"] = f"{index}:{digest}"
+        rows.append(record)
+    return rows
+
+
+def load_done(output_path):
+    # 이전 실행에서 정상 채점된 행 (재시작 시 건너뜀)
+    if not os.path.exists(output_path):
+        return set()
+    if output_path.lower().endswith(".csv"):
+        with open(output_path, newline="", encoding="utf-8") as f:
+            records = list(csv.DictReader(f))
+    else:
+        records = []
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # 크래시로 잘린 마지막 줄
+    return {r["Row_ID"] for r in records if r.get("Status") == "ok"}
+
+
+class ResultWriter:
+    """채점이 끝나는 순서대로 한 줄씩 append 한다 (JSON Lines 또는 CSV)."""
+
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.is_csv = path.lower().endswith(".csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "a", newline="", encoding="utf-8")
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._f, fieldnames=fieldnames, extrasaction="ignore")
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self.is_csv:
+            self._csv.writerow(record)
+        else:
+            self._f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# --- 채점 ---
+def grade_row(row, provider, api_key, temperature=0.5, use_cache=True, structured=False):
+    sys_msg, user_msg = build_eval_prompt(row["Crisis"], row.get("Cause", ""), row["User_Action"], row["User_Notice"], structured=structured)
+    if structured:
+        parser = EvalStreamParser()
+        parser.feed(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=temperature, use_cache=use_cache,
+                                  phase="evaluation", json_schema=EVAL_SCHEMA))
+        text = clean_ai_response(finish_structured_eval(parser, provider, api_key, use_cache=use_cache))
+    else:
+        text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=temperature, use_cache=use_cache, phase="evaluation"))
+    result = dict(row)
+    if is_ai_error(text) or parse_eval_score(text, None) is None:
+        # 점수가 없는 응답도 실패로 남겨 재시작 때 다시 채점한다
+        result.update({"Score": None, "Risk": None, "Feedback": text, "Status": "error"})
+    else:
+        result.update({"Score": parse_eval_score(text), "Risk": parse_risk_score(text), "Feedback": text, "Status": "ok"})
+    return result
+
+
+async def grade_rows(rows, provider, api_key, temperature=0.5, concurrency=None, rpm=None, use_cache=True, structured=False):
+    # 비동기 제너레이터: 끝난 순서대로 결과를 내보낸다.
+    semaphore = asyncio.Semaphore(concurrency or PROVIDER_CONCURRENCY.get(provider, 2))
+    limiter = RateLimiter(rpm if rpm is not None else PROVIDER_RPM.get(provider, 60))
+
+    async def run(row):
+        async with semaphore:
+            await limiter.wait()
+            return await asyncio.to_thread(grade_row, row, provider, api_key, temperature, use_cache, structured)
+
+    tasks = [asyncio.create_task(run(row)) for row in rows]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def grade_file_async(input_path, output_path, provider, api_key, temperature=0.5,
+                           concurrency=None, rpm=None, use_cache=True, structured=False, progress=None):
+    rows = load_rows(input_path)
+    done = load_done(output_path)
+    todo = [r for r in rows if r["Row_ID"] not in done]
+    fieldnames = list(rows[0].keys()) if rows else []
+    fieldnames += [c for c in ["Score", "Risk", "Feedback", "Status"] if c not in fieldnames]
+    summary = {"total": len(rows), "skipped": len(rows) - len(todo), "ok": 0, "error": 0}
+
+    writer = ResultWriter(output_path, fieldnames)
+    try:
+        async for result in grade_rows(todo, provider, api_key, temperature, concurrency, rpm, use_cache, structured):
+            writer.write(result)
+            summary[result["Status"]] += 1
+            if progress:
+                progress(summary)
+    finally:
+        writer.close()
+    return summary
+
+
+def grade_file(input_path, output_path, provider, api_key, **kwargs):
+    return asyncio.run(grade_file_async(input_path, output_path, provider, api_key, **kwargs))
+
+
+# --- CLI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="위기대응 시뮬레이터 제출물 일괄 채점")
+    parser.add_argument("input", help="채점할 CSV/XLSX (Crisis, Cause, User_Action, User_Notice 컬럼)")
+    parser.add_argument("-o", "--output", help="결과 파일 (.jsonl 또는 .csv). 이미 있으면 이어서 채점")
+    parser.add_argument("--provider", default="Mistral AI", choices=list(MODELS))
+    parser.add_argument("--api-key", default=os.getenv("CRISIS_API_KEY"), help="기본값: $CRISIS_API_KEY")
+    parser.add_argument("--temperature", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, help="동시 요청 수 (기본: provider 별 설정)")
+    parser.add_argument("--rpm", type=float, help="분당 요청 수 제한 (0 이면 무제한)")
+    parser.add_argument("--no-cache", action="store_true", help="LLM 응답 캐시를 쓰지 않음")
+    parser.add_argument("--structured", action="store_true", help="JSON 구조화 출력으로 채점 (빠진 항목은 짧은 보완 요청)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("API 키가 필요합니다 (--api-key 또는 CRISIS_API_KEY)")
+    output = args.output or os.path.splitext(args.input)[0] + "_graded.jsonl"
+
+    # Streamlit 런타임 밖에서 st.cache_resource 를 쓸 때 나오는 경고는 무시
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    def progress(summary):
+        finished = summary["skipped"] + summary["ok"] + summary["error"]
+        print(f"\r[{finished}/{summary['total']}] ok={summary['ok']} error={summary['error']}", end="", file=sys.stderr)
+
+    summary = grade_file(args.input, output, args.provider, args.api_key, temperature=args.temperature,
+                         concurrency=args.concurrency, rpm=args.rpm, use_cache=not args.no_cache,
+                         structured=args.structured, progress=progress)
+    print(file=sys.stderr)
+    print(f"{output}: 전체 {summary['total']}건, 건너뜀 {summary['skipped']}건, 성공 {summary['ok']}건, 실패 {summary['error']}건")
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
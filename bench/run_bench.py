@@ -0,0 +1,340 @@
+"""네트워크 없이 도는 성능 벤치마크.
+
+로컬 스텁 서버(OpenAI/Mistral/Gemini 호환)를 띄우고 두 가지를 잰다.
+  1. call_ai_brain / stream_ai_brain 직접 호출: 동시성별 처리량, 지연/TTFT 백분위, 오류율
+  2. Streamlit AppTest 로 시나리오 -> 평가 -> 멘토 전체 흐름: 동시 세션별 처리량, 리런 시간, 세션당 메모리
+
+사용법 (저장소 루트에서):
+    python -m bench.run_bench                       # 실행 후 bench/baseline.json 과 비교
+    python -m bench.run_bench --save-baseline       # 현재 결과를 기준선으로 저장
+    python -m bench.run_bench --error-rate 0.1 --stall-rate 0.02
+    python -m bench.run_bench --stall-rate 0.05 --hedge "Google Gemini" --hedge-delay 1
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "CMcrisis.py")
+BASELINE_PATH = os.path.join(ROOT, "bench", "baseline.json")
+
+# 기준선과 비교할 지표: 이름 -> 클수록 좋은가.
+# p99_s(32건이면 사실상 최댓값)와 rerun_p95_s 는 표본이 작아 실행마다 크게 흔들리므로 보고만 한다.
+COMPARED = {"throughput_rps": True, "p50_s": False, "p95_s": False, "ttft_p50_s": False,
+            "flows_per_s": True, "rerun_p50_s": False, "peak_mb_per_session": False}
+MIN_DELTA_S = 0.05  # 초 단위 지표는 이보다 작게 변하면 비율이 커도 악화로 보지 않는다
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def _configure_env(stub_url, workdir):
+    # 앱 모듈은 import 시점에 환경변수를 읽으므로 import 전에 설정한다.
+    os.environ.update({
+        "CRISIS_OPENAI_BASE_URL": f"{stub_url}/v1",
+        "CRISIS_MISTRAL_BASE_URL": stub_url,
+        "CRISIS_GEMINI_BASE_URL": stub_url,
+        "CRISIS_LLM_CACHE": "0",                 # 캐시 적중이 측정을 왜곡하지 않도록
+        "CRISIS_SCENARIO_POOL_DEPTH": "0",       # 백그라운드 프리페치 부하 제외
+        "CRISIS_METRICS_DIR": os.path.join(workdir, "metrics"),
+        "CRISIS_HISTORY_PATH": os.path.join(workdir, "history.sqlite3"),
+        "CRISIS_AI_BACKOFF_BASE": "0.05",
+        "CRISIS_AI_BACKOFF_MAX": "0.5",
+    })
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+# --- 1. 직접 호출 ---
+def bench_calls(providers, levels, requests, stream, hedge=None, hedge_delay=None):
+    # hedge 에 보조 provider 이름을 주면 헤지 모드로 호출한다.
+    from ai_brain import call_ai_brain, stream_ai_brain, is_ai_error
+
+    def one(provider, i):
+        fallbacks = [(hedge, "bench-key")] if hedge and hedge != provider else None
+        started = time.perf_counter()
+        ttft = None
+        if stream:
+            chunks = []
+            for chunk in stream_ai_brain(provider, "bench-key", "벤치마크 시스템 프롬프트", f"요청 {i}", use_cache=False, phase="bench",
+                                       fallbacks=fallbacks, hedge_delay=hedge_delay):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                chunks.append(chunk)
+            text = "".join(chunks)
+        else:
+            text = call_ai_brain(provider, "bench-key", "벤치마크 시스템 프롬프트", f"요청 {i}", use_cache=False, phase="bench",
+                                 fallbacks=fallbacks, hedge_delay=hedge_delay)
+        return time.perf_counter() - started, ttft, is_ai_error(text)
+
+    results = []
+    for provider in providers:
+        for level in levels:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                outcomes = list(pool.map(lambda i: one(provider, i), range(requests)))
+            elapsed = time.perf_counter() - started
+            ok = [o for o in outcomes if not o[2]]
+            results.append({
+                "name": f"calls/{'stream' if stream else 'block'}/{provider}/c{level}" + ("/hedge" if hedge else ""),
+                "requests": requests,
+                "errors": len(outcomes) - len(ok),
+                "throughput_rps": round(len(ok) / elapsed, 3),
+                "p50_s": _percentile([o[0] for o in ok], 50),
+                "p95_s": _percentile([o[0] for o in ok], 95),
+                "p99_s": _percentile([o[0] for o in ok], 99),
+                "ttft_p50_s": _percentile([o[1] for o in ok if o[1] is not None], 50),
+            })
+    return results
+
+
+# --- 2. AppTest 전체 흐름 ---
+def _timed_run(at, reruns):
+    started = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - started)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def _wait_job(at, reruns, timeout, poll=0.05):
+    # LLM 호출은 백그라운드 작업이라 AppTest 에서는 폴링 리런을 직접 돌려야 끝난다.
+    deadline = time.monotonic() + timeout
+    while at.session_state["active_job"]:
+        if time.monotonic() > deadline:
+            raise TimeoutError("background job did not finish")
+        time.sleep(poll)
+        _timed_run(at, reruns)
+
+
+def _button(at, prefix):
+    return next(b for b in at.button if b.label.startswith(prefix))
+
+
+def _start_job(at, prefix, reruns, timeout):
+    # 버튼을 눌러 작업을 시작하고 끝날 때까지 기다린다. 작업이 안 생기면(가채점 거절 등) 그 단계를
+    # 조용히 빼고 재는 셈이므로 실패로 처리한다.
+    _button(at, prefix).click()
+    _timed_run(at, reruns)
+    if not at.session_state["active_job"]:
+        messages = [w.value for w in at.warning] + [e.value for e in at.error]
+        raise RuntimeError(f"{prefix}: background job was not started {messages}")
+    _wait_job(at, reruns, timeout)
+
+
+BENCH_NOTICE = (
+    "[공지] 접속 장애로 불편을 드려 죄송합니다.\n"
+    "서버 오류의 원인을 확인하였으며 오늘 오후 6시까지 복구를 완료할 예정입니다.\n"
+    "보상으로 다이아 300개를 우편함으로 지급하고, 재발 방지를 위해 모니터링을 강화하겠습니다."
+)
+
+
+def run_flow(provider, timeout=120):
+    # 한 세션: 첫 화면 -> 위기 상황 발령 -> 평가 제출 -> 멘토 찬스. 리런 시간 목록을 돌려준다.
+    from streamlit.testing.v1 import AppTest
+
+    # AppTest 는 앱 스크립트를 __main__ 으로 실행해 sys.modules 에 남긴다. 그대로 두면 이후 spawn 한
+    # 워커 프로세스가 __main__ 을 되살리려고 CMcrisis.py 를 bare 모드로 실행하므로 끝나면 되돌린다.
+    main_module = sys.modules["__main__"]
+    try:
+        return _run_flow(AppTest, provider, timeout)
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+def _run_flow(AppTest, provider, timeout):
+    reruns = []
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    _timed_run(at, reruns)
+    at.sidebar.selectbox[0].set_value(provider)
+    _timed_run(at, reruns)                       # 키 입력란 라벨이 모델 이름을 따라 바뀌므로 먼저 반영
+    at.sidebar.text_input[0].input("bench-key")
+    _timed_run(at, reruns)
+    _start_job(at, "💣", reruns, timeout)         # 브리핑 + 기밀 생성
+    at.text_area[0].input("개발팀에 원복 요청, 서버 로그 분석 후 오류 원인 파악")
+    at.text_area[1].input(BENCH_NOTICE)            # 가채점 최소 길이를 넘는 실제 공지 수준의 답안
+    _start_job(at, "결재", reruns, timeout)        # 평가
+    _start_job(at, "🏃", reruns, timeout)          # 멘토
+    return reruns
+
+
+def _init_worker(stub_url, workdir, provider):
+    # 워커도 첫 흐름의 import/컴파일 비용을 측정 전에 치르게 한다.
+    _configure_env(stub_url, workdir)
+    run_flow(provider)
+
+
+def bench_flows(providers, levels, sessions, stub_url, workdir):
+    # AppTest 는 전역 Runtime 을 바꿔 끼우므로 한 프로세스에서 동시에 돌릴 수 없다.
+    # 동시 세션은 별도 프로세스로 띄우고, 모두 같은 스텁 서버를 두드린다.
+    # (python -m 으로 실행하면 이 모듈이 __main__ 이라 피클링되도록 모듈 이름으로 다시 참조한다)
+    from bench import run_bench as harness
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for provider in providers:
+        # 첫 흐름은 streamlit.testing / openpyxl / 앱 모듈 / provider SDK import 와 스크립트 컴파일을
+        # 떠안으므로 한 번 먼저 돌려 두고, 세션당 메모리는 그다음 단독 세션의 tracemalloc 피크로 잰다.
+        run_flow(provider)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        run_flow(provider)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = round((peak - base) / 1024 / 1024, 2)
+
+        for level in levels:
+            with ProcessPoolExecutor(max_workers=level, mp_context=context,
+                                     initializer=harness._init_worker, initargs=(stub_url, workdir, provider)) as pool:
+                warm = [pool.submit(harness._configure_env, stub_url, workdir) for _ in range(level)]
+                for future in warm:
+                    future.result()  # 프로세스 기동 + 워밍업 시간은 측정에서 뺀다
+                started = time.perf_counter()
+                runs = list(pool.map(harness.run_flow, [provider] * sessions))
+            elapsed = time.perf_counter() - started
+            reruns = [r for run in runs for r in run]
+            results.append({
+                "name": f"flow/{provider}/c{level}",
+                "sessions": sessions,
+                "flows_per_s": round(sessions / elapsed, 3),
+                "rerun_p50_s": _percentile(reruns, 50),
+                "rerun_p95_s": _percentile(reruns, 95),
+                "peak_mb_per_session": peak_mb,
+            })
+    return results
+
+
+# --- 스텁 서버 프로세스 ---
+def _serve_stub(config, conn):
+    from bench.stub_server import start_stub_server
+
+    server, url = start_stub_server(config)
+    conn.send(url)
+    conn.recv()  # 부모가 닫을 때까지 대기
+    server.shutdown()
+
+
+def _start_stub_process(config):
+    # 스텁 서버를 같은 프로세스에 두면 토큰 페이싱/SSE 처리가 측정 대상 스레드와 GIL 을 다퉈
+    # 동시성이 높을수록 결과가 흔들린다. 별도 프로세스로 띄워 (process, url, conn) 을 돌려준다.
+    context = multiprocessing.get_context("spawn")
+    conn, child = context.Pipe()
+    process = context.Process(target=_serve_stub, args=(config, child), daemon=True)
+    process.start()
+    return process, conn.recv(), conn
+
+
+def _stop_stub_process(process, conn):
+    conn.send(None)
+    process.join(timeout=5)
+    if process.is_alive():
+        process.terminate()
+
+
+# --- 기준선 비교 ---
+def compare(results, baseline, tolerance):
+    # 허용 범위를 넘어 나빠진 지표 목록
+    regressions = []
+    base_by_name = {r["name"]: r for r in baseline}
+    for result in results:
+        base = base_by_name.get(result["name"])
+        if not base:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            new, old = result.get(metric), base.get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            if metric.endswith("_s") and abs(new - old) < MIN_DELTA_S:
+                continue
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append((result["name"], metric, old, new, change))
+    return regressions
+
+
+def _print_table(results):
+    for r in results:
+        fields = "  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items() if k != "name")
+        print(f"{r['name']:<45} {fields}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="위기대응 시뮬레이터 오프라인 벤치마크")
+    parser.add_argument("--providers", nargs="+", default=["Mistral AI", "Google Gemini", "OpenAI (GPT-4o)"])
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 4, 16], help="동시성 단계")
+    parser.add_argument("--requests", type=int, default=32, help="단계별 직접 호출 수")
+    parser.add_argument("--sessions", type=int, default=4, help="단계별 AppTest 세션 수")
+    parser.add_argument("--flow-levels", nargs="+", type=int, default=[1, 4], help="AppTest 동시 세션 단계")
+    parser.add_argument("--skip-flow", action="store_true", help="AppTest 흐름 측정 생략")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-rate", type=float, default=400)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--hedge", help="직접 호출을 이 보조 provider 와 헤지 모드로 측정")
+    parser.add_argument("--hedge-delay", type=float, help="헤지 첫 토큰 대기 시간 (기본: CRISIS_HEDGE_DELAY)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용 악화 비율 (0.25 = 25%%)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args(argv)
+
+    from bench.stub_server import StubConfig
+    from bench import run_bench as harness
+
+    config = StubConfig(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens,
+                        error_rate=args.error_rate, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds)
+    stub_process, url, stub_conn = harness._start_stub_process(config)
+    workdir = tempfile.mkdtemp(prefix="crisis-bench-")
+    _configure_env(url, workdir)
+
+    results = []
+    results += bench_calls(args.providers, args.levels, args.requests, stream=False, hedge=args.hedge, hedge_delay=args.hedge_delay)
+    results += bench_calls(args.providers, args.levels, args.requests, stream=True, hedge=args.hedge, hedge_delay=args.hedge_delay)
+    if not args.skip_flow:
+        results += bench_flows(args.providers, args.flow_levels, args.sessions, url, workdir)
+    harness._stop_stub_process(stub_process, stub_conn)
+
+    report = {"config": vars(config), "results": results}
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"기준선 저장: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("기준선 없음 (--save-baseline 으로 생성)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print("⚠ 기준선과 스텁 설정이 달라 비교가 부정확할 수 있습니다.")
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESSION {name} {metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+    if not regressions:
+        print(f"기준선 대비 악화 없음 (허용 {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
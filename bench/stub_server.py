@@ -0,0 +1,229 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 평가 파서가 점수를 읽을 수 있도록 마커를 포함한 고정 응답
+CANNED_TEXT = (
+    "[[점수: 72]]\n[[리스크: 35]]\n\n"
+    "## 🔮 미래 시뮬레이션\n"
+    "**🌞 [희망편]:** 빠른 사과와 보상으로 여론이 진정됩니다.\n"
+    "**⛈️ [절망편]:** 후속 공지가 늦어지면 환불 요청이 늘어납니다.\n\n"
+    "## 📝 멘토의 피드백\n"
+    "**💬 총평:** 원인 설명이 명확해요. 재발 방지 일정만 보완하면 좋겠습니다.\n"
+)
+# JSON 모드(response_format / responseMimeType) 요청에 대한 고정 응답. 채움 문장은 붙이지 않는다.
+CANNED_JSON = json.dumps({
+    "score": 72, "risk": 35,
+    "hope": "빠른 사과와 보상으로 여론이 진정됩니다.",
+    "despair": "후속 공지가 늦어지면 환불 요청이 늘어납니다.",
+    "summary": "원인 설명이 명확해요. 재발 방지 일정만 보완하면 좋겠습니다.",
+    "correction": "공지에 재발 방지 일정을 한 줄 추가해 주세요.",
+}, ensure_ascii=False)
+FILLER = "유저 커뮤니티 반응과 지표 변화를 계속 모니터링해야 합니다. "
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.3          # 첫 토큰까지 지연(초)
+    token_rate: float = 200.0     # 초당 출력 토큰 수 (0 이면 즉시)
+    tokens: int = 300             # 응답 토큰 수
+    error_rate: float = 0.0       # 오류 응답 비율 (0~1)
+    error_status: int = 503
+    stall_rate: float = 0.0       # 첫 토큰 전에 stall_seconds 만큼 멈추는 비율 (꼬리 지연 재현)
+    stall_seconds: float = 10.0
+
+
+def _tokens(count, json_mode=False):
+    # 약 4글자를 한 토큰으로 보고 고정 응답을 자른다.
+    text = CANNED_JSON if json_mode else CANNED_TEXT
+    while not json_mode and len(text) < count * 4:
+        text += FILLER
+    text = text[:count * 4]
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def _prompt_tokens(payload):
+    return max(1, len(json.dumps(payload, ensure_ascii=False)) // 3)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: 클라이언트 풀 재사용 효과가 보이도록
+    config = StubConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- 공통 ---
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _chunk(self, data):
+        data = data.encode() if isinstance(data, str) else data
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _before_first_token(self):
+        # 오류 주입 / 지연 / 멈춤. 오류를 보냈으면 True
+        cfg = self.config
+        if cfg.error_rate and random.random() < cfg.error_rate:
+            self._send_json(cfg.error_status, {"error": {"message": "stub injected error", "code": cfg.error_status}})
+            return True
+        delay = cfg.latency
+        if cfg.stall_rate and random.random() < cfg.stall_rate:
+            delay += cfg.stall_seconds
+        time.sleep(delay)
+        return False
+
+    def _pace(self):
+        if self.config.token_rate:
+            time.sleep(1.0 / self.config.token_rate)
+
+    def do_POST(self):
+        payload = self._read_json()
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            self._chat_completions(payload)
+        elif ":streamGenerateContent" in path:
+            self._gemini(payload, path, stream=True)
+        elif ":generateContent" in path:
+            self._gemini(payload, path, stream=False)
+        else:
+            self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+    # --- OpenAI / Mistral chat completions ---
+    def _chat_completions(self, payload):
+        if self._before_first_token():
+            return
+        model = payload.get("model", "stub")
+        limit = payload.get("max_tokens") or self.config.tokens
+        pieces = _tokens(min(self.config.tokens, limit), json_mode=bool(payload.get("response_format")))
+        usage = {"prompt_tokens": _prompt_tokens(payload), "completion_tokens": len(pieces),
+                 "total_tokens": _prompt_tokens(payload) + len(pieces)}
+        base = {"id": f"stub-{random.getrandbits(32):x}", "created": int(time.time()), "model": model}
+
+        if not payload.get("stream"):
+            for _ in pieces:
+                self._pace()
+            self._send_json(200, {
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self._start_chunked("text/event-stream")
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": "stop" if last else None}]}
+            if last:
+                chunk["usage"] = usage   # Mistral 은 마지막 청크에 usage 를 싣는다
+            self._chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+            self._pace()
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._chunk(f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._end_chunked()
+
+    # --- Gemini (REST) ---
+    def _gemini(self, payload, path, stream):
+        if self._before_first_token():
+            return
+        generation_config = payload.get("generationConfig") or {}
+        limit = generation_config.get("maxOutputTokens") or self.config.tokens
+        json_mode = (generation_config.get("responseMimeType") or generation_config.get("response_mime_type")) == "application/json"
+        pieces = _tokens(min(self.config.tokens, int(limit)), json_mode=json_mode)
+        prompt_tokens = _prompt_tokens(payload)
+
+        def body(text, done, count):
+            candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if done:
+                candidate["finishReason"] = 1  # STOP
+            return {"candidates": [candidate],
+                    "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": count,
+                                      "totalTokenCount": prompt_tokens + count}}
+
+        if not stream:
+            for _ in pieces:
+                self._pace()
+            self._send_json(200, body("".join(pieces), True, len(pieces)))
+            return
+
+        # gapic REST 스트리밍은 SSE 가 아니라 JSON 배열을 조금씩 흘려보낸다.
+        self._start_chunked("application/json")
+        self._chunk("[")
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            self._chunk(("," if i else "") + json.dumps(body(piece, last, i + 1), ensure_ascii=False))
+            self._pace()
+        self._chunk("]")
+        self._end_chunked()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 클라이언트가 스트림을 끝까지 읽지 않고 끊는 것은 정상 동작이다.
+        if not isinstance(sys.exc_info()[1], (ConnectionError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    # 백그라운드 스레드로 띄우고 (server, base_url) 을 돌려준다. port=0 이면 빈 포트 자동 선택
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config or StubConfig()})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI/Mistral/Gemini 호환 로컬 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=StubConfig.latency)
+    parser.add_argument("--token-rate", type=float, default=StubConfig.token_rate)
+    parser.add_argument("--tokens", type=int, default=StubConfig.tokens)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=StubConfig.error_status)
+    parser.add_argument("--stall-rate", type=float, default=StubConfig.stall_rate)
+    parser.add_argument("--stall-seconds", type=float, default=StubConfig.stall_seconds)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency, args.token_rate, args.tokens, args.error_rate,
+                        args.error_status, args.stall_rate, args.stall_seconds)
+    server, url = start_stub_server(config, args.host, args.port)
+    print(f"stub server: {url}")
+    print(f"  CRISIS_OPENAI_BASE_URL={url}/v1  CRISIS_MISTRAL_BASE_URL={url}  CRISIS_GEMINI_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
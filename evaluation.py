@@ -0,0 +1,224 @@
+import os
+import re
+import json
+
+from ai_brain import call_ai_brain, is_ai_error
+from prompts import PHASE_INPUT_BUDGET, render_sections
+
+# 구조화(JSON) 평가 모드를 기본으로 켤지 (사이드바에서 세션별로 바꿀 수 있다)
+STRUCTURED_EVAL = os.getenv("CRISIS_STRUCTURED_EVAL", "0") == "1"
+
+# --- 평가 / 멘토 프롬프트 ---
+# system 은 고정 문자열로 두고 (provider 프롬프트 캐시), 바뀌는 내용은 모두 user 메시지에 싣는다.
+# user 메시지는 [상황][진실] 을 맨 앞에 두어 같은 시나리오에서 다시 제출할 때 앞부분이 같도록 한다.
+EVAL_TONE = (
+    "너는 게임 운영의 신이자, 친절한 멘토다. CM(사용자)의 대응을 평가해라. "
+    "**[말투 가이드]**\n"
+    "- 딱딱한 보고서체 금지. **부드럽고 정중한 해요체(~입니다, ~하셨군요)** 사용.\n"
+    "- 사용자를 격려하면서도, 고쳐야 할 점은 명확하게 지적.\n\n"
+)
+
+EVAL_SYSTEM = EVAL_TONE + (
+    "**[출력 형식]**\n"
+    "[[점수: 0~100]]\n[[리스크: 0~100]]\n\n"
+    "## 🔮 미래 시뮬레이션\n"
+    "**🌞 [희망편]:**\n**⛈️ [절망편]:**\n\n"
+    "## 📝 멘토의 피드백\n"
+    "**💬 총평:**\n**✍️ [첨삭 지도]:** (공지사항 문구 수정 제안)"
+)
+
+# 구조화 모드: 점수/리스크가 먼저 오도록 키 순서를 고정한다.
+EVAL_FIELDS = ["score", "risk", "hope", "despair", "summary", "correction"]
+EVAL_SCHEMA = {
+    "title": "evaluation",
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "description": "대응 점수 (0~100)"},
+        "risk": {"type": "integer", "description": "여론 악화 리스크 (0~100)"},
+        "hope": {"type": "string", "description": "희망편 미래 시뮬레이션"},
+        "despair": {"type": "string", "description": "절망편 미래 시뮬레이션"},
+        "summary": {"type": "string", "description": "총평"},
+        "correction": {"type": "string", "description": "공지사항 문구 수정 제안"},
+    },
+    "required": EVAL_FIELDS,
+}
+
+EVAL_JSON_SYSTEM = EVAL_TONE + (
+    "**[출력 형식]**\n"
+    "아래 키를 이 순서대로 가진 JSON 객체 하나만 출력해라. 마크다운 코드블록이나 다른 설명은 붙이지 마라.\n"
+    '{"score": 0~100 정수, "risk": 0~100 정수, "hope": "🌞 희망편", "despair": "⛈️ 절망편", '
+    '"summary": "💬 총평", "correction": "✍️ 첨삭 지도 (공지사항 문구 수정 제안)"}'
+)
+
+REPAIR_SYSTEM = (
+    "너는 평가 응답 교정기다. 주어진 평가 응답에서 요청한 필드만 뽑아 JSON 객체 하나로 답해라. "
+    "응답에 해당 내용이 없으면 응답의 논조에 맞게 짧게 채워라. 설명 없이 JSON 만 출력해라."
+)
+
+MENTOR_SYSTEM = (
+    "너는 업계 최고의 위기 관리 전문가다. 현재 상황과 내부 진실을 고려하여 **가장 이상적인 대응책(정답)**을 제시해라.\n"
+    "**[필수 포함 내용]**\n"
+    "1. **추천 내부 조치:** 개발팀/유관부서에 지시해야 할 현실적인 액션 아이템.\n"
+    "2. **추천 공지사항:** 유저의 분노를 잠재우고 신뢰를 회복할 수 있는 완벽한 사과문(또는 안내문) 초안."
+)
+
+
+def build_eval_prompt(public, cause, action, notice, structured=False):
+    user_msg = render_sections(
+        [("상황", public), ("진실", cause), ("조치", action), ("공지", notice)],
+        budget=PHASE_INPUT_BUDGET["evaluation"], verbatim=("조치", "공지")
+    )
+    return (EVAL_JSON_SYSTEM if structured else EVAL_SYSTEM), user_msg
+
+
+def build_mentor_prompt(public, cause):
+    user_msg = render_sections([("상황", public), ("진실", cause)], budget=PHASE_INPUT_BUDGET["mentor"])
+    return MENTOR_SYSTEM, user_msg + "\n\n이 상황을 타개할 모범 답안을 작성해줘."
+
+
+def build_repair_prompt(raw, names):
+    # 빠지거나 깨진 필드만 다시 받는 짧은 요청. 전체 재평가보다 입력/출력이 훨씬 적다.
+    spec = ", ".join(f'"{name}": {EVAL_SCHEMA["properties"][name]["description"]}' for name in names)
+    user_msg = render_sections([("평가 응답", raw), ("필요한 필드", spec)], budget=PHASE_INPUT_BUDGET["repair"])
+    schema = {"title": "evaluation_repair", "type": "object",
+              "properties": {name: EVAL_SCHEMA["properties"][name] for name in names}, "required": list(names)}
+    return REPAIR_SYSTEM, user_msg, schema
+
+
+# --- 점수 파싱 ---
+def parse_risk_score(text, default=50):
+    match = re.search(r"\[\[리스크:\s*(\d{1,3})\]\]", text)
+    return int(match.group(1)) if match else default
+
+def parse_eval_score(text, default=0):
+    match = re.search(r"\[\[점수:\s*(\d{1,3})\]\]", text)
+    return int(match.group(1)) if match else default
+
+
+# --- 구조화 출력 파싱 ---
+def _scan_string(text, i):
+    # text[i] 의 따옴표부터 JSON 문자열을 읽는다: (값, 다음 위치, 끝까지 읽었는지).
+    # 아직 닫히지 않았으면 지금까지 온 부분을 디코딩해 돌려준다 (잘린 이스케이프는 버린다).
+    j = i + 1
+    while j < len(text):
+        if text[j] == "\\":
+            j += 2
+        elif text[j] == '"':
+            return json.loads(text[i:j + 1], strict=False), j + 1, True
+        else:
+            j += 1
+    body = text[i + 1:]
+    for candidate in (body, re.sub(r"\\(u[0-9a-fA-F]{0,3})?$", "", body)):
+        try:
+            return json.loads(f'"{candidate}"', strict=False), len(text), False
+        except ValueError:
+            pass
+    return None, len(text), False
+
+
+def parse_partial_json(text):
+    # 스트리밍 중인 JSON 객체에서 지금까지 읽을 수 있는 최상위 필드를 앞에서부터 꺼낸다.
+    # (fields, done): done 은 값까지 끝난 키. 쓰는 중인 문자열 값은 지금까지의 내용으로 채운다.
+    fields, done = {}, set()
+    i = text.find("{") + 1
+    if not i:
+        return fields, done
+    decoder = json.JSONDecoder(strict=False)
+    while True:
+        while i < len(text) and text[i] in " \t\r\n,":
+            i += 1
+        if i >= len(text) or text[i] != '"':
+            break  # 객체 끝이거나 아직 안 온 부분
+        key, i, complete = _scan_string(text, i)
+        if not complete:
+            break
+        while i < len(text) and text[i] in " \t\r\n:":
+            i += 1
+        if i >= len(text):
+            break
+        if text[i] == '"':
+            value, i, complete = _scan_string(text, i)
+            if value is not None:
+                fields[key] = value
+            if not complete:
+                break
+        else:
+            try:
+                value, end = decoder.raw_decode(text, i)
+            except ValueError:
+                break
+            if end >= len(text) and isinstance(value, (int, float)):
+                break  # 숫자는 뒤에 자릿수가 더 올 수 있다
+            fields[key], i = value, end
+        done.add(key)
+    return fields, done
+
+
+def _coerce(name, value):
+    # 필드 값을 정규화한다. 쓸 수 없는 값이면 None.
+    if name in ("score", "risk"):
+        try:
+            number = int(float(value))
+        except (TypeError, ValueError):
+            return None
+        return number if 0 <= number <= 100 else None
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def render_eval_markdown(fields):
+    # 자유 형식 평가와 같은 마크다운으로 바꿔 화면/기록/parse_eval_score 가 그대로 동작하게 한다.
+    lines = []
+    if fields.get("score") is not None: lines.append(f"[[점수: {fields['score']}]]")
+    if fields.get("risk") is not None: lines.append(f"[[리스크: {fields['risk']}]]")
+    if fields.get("hope") or fields.get("despair"):
+        lines += ["", "## 🔮 미래 시뮬레이션"]
+        if fields.get("hope"): lines.append(f"**🌞 [희망편]:** {fields['hope']}")
+        if fields.get("despair"): lines.append(f"**⛈️ [절망편]:** {fields['despair']}")
+    if fields.get("summary") or fields.get("correction"):
+        lines += ["", "## 📝 멘토의 피드백"]
+        if fields.get("summary"): lines.append(f"**💬 총평:** {fields['summary']}")
+        if fields.get("correction"): lines.append(f"**✍️ [첨삭 지도]:** {fields['correction']}")
+    return "\n".join(lines)
+
+
+class EvalStreamParser:
+    """구조화 모드의 평가 응답을 조각 단위로 읽는 파서.
+
+    feed() 는 지금까지 읽힌 필드를 기존 마크다운 형식으로 돌려주므로, 점수/리스크가 먼저
+    보이고 희망편/절망편/피드백이 차례로 채워진다. 스트림이 끝나면 finish_structured_eval()
+    로 빠진 필드를 보완한다.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.fields = {}
+        self.done = set()
+
+    def feed(self, chunk):
+        self.raw += chunk
+        self.fields, self.done = parse_partial_json(self.raw)
+        return render_eval_markdown(self.fields)
+
+    def invalid_fields(self):
+        return [name for name in EVAL_FIELDS if name not in self.done or _coerce(name, self.fields.get(name)) is None]
+
+
+def finish_structured_eval(parser, provider, api_key, **call_kwargs):
+    # 빠지거나 깨진 필드만 repair 요청으로 채우고 최종 마크다운을 돌려준다.
+    # call_kwargs 는 call_ai_brain 에 그대로 넘긴다 (fallbacks, hedge_delay, use_cache 등).
+    if not parser.raw.strip() or is_ai_error(parser.raw):
+        return parser.raw.strip()
+    missing = parser.invalid_fields()
+    if missing and not parser.fields and parse_eval_score(parser.raw, None) is not None:
+        return parser.raw.strip()  # JSON 대신 예전 마크다운 형식으로 답한 경우
+    fields = {name: _coerce(name, parser.fields.get(name)) for name in EVAL_FIELDS}
+    if missing:
+        sys_msg, user_msg, schema = build_repair_prompt(parser.raw, missing)
+        text = call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=0, phase="repair", json_schema=schema, **call_kwargs)
+        if not is_ai_error(text):
+            repaired, _ = parse_partial_json(text)
+            for name in missing:
+                value = _coerce(name, repaired.get(name))
+                if value is not None:
+                    fields[name] = value
+    return render_eval_markdown(fields)
@@ -0,0 +1,95 @@
+import io
+import csv
+import json
+import importlib.util
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from history_store import HISTORY_COLUMNS
+
+# --- 내보내기 형식: 표시 이름 -> (확장자, MIME) ---
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.csv)": ("csv", "text/csv"),
+    "JSON Lines (.jsonl)": ("jsonl", "application/x-ndjson"),
+}
+if importlib.util.find_spec("pyarrow") is not None:
+    EXPORT_FORMATS["Parquet (.parquet)"] = ("parquet", "application/vnd.apache.parquet")
+
+
+def _columns(records):
+    # 예전 기록에는 없는 컬럼(Cause 등)이 있어도 첫 등장 순서대로 합친다.
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def _to_xlsx(records, columns, out):
+    # write-only 모드: 행을 스트리밍으로 써서 전체 시트를 메모리에 올리지 않는다.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Log")
+    ws.append(columns)
+    for record in records:
+        row = []
+        for c in columns:
+            value = record.get(c)
+            row.append(ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value)
+        ws.append(row)
+    wb.save(out)
+
+
+def _to_csv(records, columns, out):
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")  # BOM: 엑셀에서 한글 깨짐 방지
+    writer = csv.DictWriter(text, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+    text.flush()
+    text.detach()
+
+
+def _to_jsonl(records, columns, out):
+    for record in records:
+        out.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+
+def _to_parquet(records, columns, out):
+    import pandas as pd
+    pd.DataFrame(list(records), columns=columns).to_parquet(out, index=False)
+
+
+_WRITERS = {"xlsx": _to_xlsx, "csv": _to_csv, "jsonl": _to_jsonl, "parquet": _to_parquet}
+
+
+def build_export(records, export_format, columns=None):
+    # columns 를 주면 records 는 한 번만 훑는 이터레이터여도 된다.
+    if columns is None:
+        records = list(records)
+        columns = _columns(records)
+    ext, _ = EXPORT_FORMATS[export_format]
+    out = io.BytesIO()
+    _WRITERS[ext](records, columns, out)
+    return out.getvalue()
+
+
+def lazy_export(history, export_format, cache):
+    """download_button 에 넘길 지연 생성 콜백.
+
+    실제 변환은 사용자가 다운로드를 누를 때만 일어나고, 결과는 (version, 형식) 별로
+    cache(dict) 에 보관해 기록이 바뀔 때까지 재사용한다. 기록은 저장소에서 배치 단위로 읽는다.
+    """
+    version = history.version
+
+    def build():
+        key = (version, export_format)
+        if key not in cache:
+            data = build_export(history.iter_records(), export_format, HISTORY_COLUMNS)
+            # 이전 버전의 결과는 더 이상 쓸 일이 없다.
+            for old in [k for k in cache if k[0] != version]:
+                del cache[old]
+            cache[key] = data
+        return cache[key]
+    return build
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import itertools
+from collections import deque
+
+import streamlit as st
+
+# --- 기록 저장소 설정 (환경변수로 조정 가능) ---
+HISTORY_BACKEND = os.getenv("CRISIS_HISTORY_BACKEND", "sqlite")
+HISTORY_PATH = os.getenv("CRISIS_HISTORY_PATH", os.path.join(".cache", "history.sqlite3"))
+HISTORY_WINDOW = int(os.getenv("CRISIS_HISTORY_WINDOW", "5"))                    # 세션별로 메모리에 두는 최근 기록 수
+HISTORY_RETENTION_DAYS = float(os.getenv("CRISIS_HISTORY_RETENTION_DAYS", "90"))  # 이보다 오래된 기록은 삭제
+HISTORY_MAX_PER_SESSION = int(os.getenv("CRISIS_HISTORY_MAX_PER_SESSION", "1000"))
+HISTORY_COMPACT_DAYS = float(os.getenv("CRISIS_HISTORY_COMPACT_DAYS", "0"))       # 이보다 오래된 기록은 긴 본문을 비움 (0 이면 끔)
+MAX_CLAIMS = 1000     # 기록 ID 점유표가 이만큼 커지면 끊긴 세션을 정리
+MAINTAIN_EVERY = 200  # append 가 이만큼 쌓일 때마다 보존 정책 적용
+
+# 엑셀 내보내기와 같은 컬럼 순서
+HISTORY_COLUMNS = ["Genre", "Score", "Risk", "Crisis", "Cause", "User_Action", "User_Notice", "Feedback"]
+# 압축(compaction) 때 비우는 긴 본문 컬럼. 점수 등 요약 값은 남긴다.
+BULKY_COLUMNS = ["Crisis", "Cause", "User_Notice", "Feedback"]
+
+
+class HistoryStore:
+    """세션별 시뮬레이션 기록 저장소 인터페이스.
+
+    page() 는 최신 기록부터, iter_records() 는 오래된 기록부터 돌려준다.
+    with_ids=True 면 iter_records() 가 (기록 ID, 기록) 쌍을 내고, get() 으로 그 기록을 다시 읽는다.
+    """
+
+    def append(self, session_id, record):
+        raise NotImplementedError
+
+    def count(self, session_id):
+        raise NotImplementedError
+
+    def page(self, session_id, offset=0, limit=20):
+        raise NotImplementedError
+
+    def iter_records(self, session_id, batch_size=200, with_ids=False):
+        raise NotImplementedError
+
+    def get(self, session_id, record_id):
+        raise NotImplementedError
+
+    def maintain(self):
+        # 보존 정책 / 압축. 기본 구현은 아무것도 하지 않는다.
+        pass
+
+
+class MemoryHistoryStore(HistoryStore):
+    """프로세스 메모리에만 두는 저장소 (개발/테스트용)."""
+
+    def __init__(self, max_per_session=HISTORY_MAX_PER_SESSION):
+        self.max_per_session = max_per_session
+        self._records = {}      # session_id -> deque[(기록 ID, 기록)]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def append(self, session_id, record):
+        with self._lock:
+            records = self._records.setdefault(session_id, deque(maxlen=self.max_per_session))
+            records.append((next(self._ids), dict(record)))
+
+    def count(self, session_id):
+        return len(self._records.get(session_id, ()))
+
+    def page(self, session_id, offset=0, limit=20):
+        with self._lock:
+            records = [record for _, record in self._records.get(session_id, ())]
+        records.reverse()
+        return records[offset:offset + limit]
+
+    def iter_records(self, session_id, batch_size=200, with_ids=False):
+        with self._lock:
+            records = list(self._records.get(session_id, ()))
+        for record_id, record in records:
+            yield (record_id, record) if with_ids else record
+
+    def get(self, session_id, record_id):
+        with self._lock:
+            return next((record for i, record in self._records.get(session_id, ()) if i == record_id), None)
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """SQLite 저장소. 세션/스레드가 동시에 써도 되도록 WAL + 스레드별 커넥션을 쓴다."""
+
+    def __init__(self, path=HISTORY_PATH, retention_days=HISTORY_RETENTION_DAYS,
+                 max_per_session=HISTORY_MAX_PER_SESSION, compact_days=HISTORY_COMPACT_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_per_session = max_per_session
+        self.compact_days = compact_days
+        self._appends = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, created REAL NOT NULL,"
+            " compacted INTEGER NOT NULL DEFAULT 0, record TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_session ON history(session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_created ON history(created)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, session_id, record):
+        self._conn().execute(
+            "INSERT INTO history (session_id, created, record) VALUES (?, ?, ?)",
+            (session_id, time.time(), json.dumps(record, ensure_ascii=False, default=str))
+        )
+        with self._lock:
+            self._appends += 1
+            due = self._appends % MAINTAIN_EVERY == 0
+        if due:
+            self.maintain()
+
+    def count(self, session_id):
+        return self._conn().execute("SELECT COUNT(*) FROM history WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def page(self, session_id, offset=0, limit=20):
+        rows = self._conn().execute(
+            "SELECT record FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (session_id, limit, offset)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_records(self, session_id, batch_size=200, with_ids=False):
+        # keyset 페이지네이션: 큰 기록도 batch_size 만큼씩만 메모리에 올린다.
+        last_id = 0
+        while True:
+            rows = self._conn().execute(
+                "SELECT id, record FROM history WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (session_id, last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row_id, record in rows:
+                yield (row_id, json.loads(record)) if with_ids else json.loads(record)
+            last_id = rows[-1][0]
+
+    def get(self, session_id, record_id):
+        row = self._conn().execute(
+            "SELECT record FROM history WHERE session_id = ? AND id = ?", (session_id, record_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def maintain(self):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 1) 보존 기간이 지난 기록 삭제
+            conn.execute("DELETE FROM history WHERE created < ?", (now - self.retention_days * 86400,))
+            # 2) 세션별 최대 개수를 넘는 오래된 기록 삭제
+            conn.execute(
+                "DELETE FROM history WHERE id IN ("
+                " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY id DESC) AS rn FROM history)"
+                " WHERE rn > ?)",
+                (self.max_per_session,)
+            )
+            # 3) 압축 (켠 경우만): 오래된 기록은 점수 등 요약만 남기고 긴 본문을 비운다.
+            #    내보내기와 일괄 재채점이 본문을 쓰므로 기본은 꺼 둔다.
+            rows = conn.execute(
+                "SELECT id, record FROM history WHERE compacted = 0 AND created < ?",
+                (now - self.compact_days * 86400,)
+            ).fetchall() if self.compact_days > 0 else []
+            for row_id, record in rows:
+                data = json.loads(record)
+                for column in BULKY_COLUMNS:
+                    if column in data:
+                        data[column] = ""
+                conn.execute(
+                    "UPDATE history SET record = ?, compacted = 1 WHERE id = ?",
+                    (json.dumps(data, ensure_ascii=False, default=str), row_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# --- 백엔드 등록 ---
+BACKENDS = {"sqlite": SQLiteHistoryStore, "memory": MemoryHistoryStore}
+
+
+@st.cache_resource
+def get_history_store():
+    # 모든 세션이 공유하는 저장소. 시작할 때 한 번 보존 정책을 적용한다.
+    store = BACKENDS[HISTORY_BACKEND]()
+    store.maintain()
+    return store
+
+
+class SessionClaims:
+    """기록 ID 를 어느 Streamlit 세션이 쓰고 있는지 기억한다.
+
+    URL 의 sid 는 인증이 아니라서 링크를 공유하면 여러 사람이 같은 기록을 보게 된다.
+    다른 세션이 아직 연결된 채로 쓰고 있는 sid 는 넘겨주지 않는다.
+    """
+
+    def __init__(self):
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def claim(self, history_id, owner):
+        with self._lock:
+            current = self._owners.get(history_id)
+            if current not in (None, owner) and _is_live_session(current):
+                return False
+            if current is None and len(self._owners) >= MAX_CLAIMS:
+                # 끊긴 세션의 기록 ID 는 다시 쓸 수 있게 놓아준다
+                self._owners = {k: v for k, v in self._owners.items() if _is_live_session(v)}
+            self._owners[history_id] = owner
+            return True
+
+
+def _is_live_session(session_id):
+    # 알 수 없으면 살아 있는 것으로 본다 (기록을 섞는 것보다 새 기록을 여는 편이 안전)
+    try:
+        from streamlit.runtime import Runtime
+        return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True
+
+
+@st.cache_resource
+def get_session_claims():
+    return SessionClaims()
+
+
+class SessionHistory:
+    """한 세션의 기록 뷰. 최근 HISTORY_WINDOW 개만 메모리에 두고 나머지는 저장소에서 읽는다."""
+
+    def __init__(self, store, session_id, window=HISTORY_WINDOW):
+        self.store = store
+        self.session_id = session_id
+        self.recent = deque(store.page(session_id, 0, window)[::-1], maxlen=window)
+        self._count = store.count(session_id)
+
+    def append(self, record):
+        self.store.append(self.session_id, record)
+        self.recent.append(record)
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def version(self):
+        # 기록은 append 만 되므로 개수가 곧 버전이다.
+        return self._count
+
+    def page(self, offset=0, limit=20):
+        # 최신순 페이지. 메모리 창 안이면 저장소를 건드리지 않는다.
+        if offset + limit <= len(self.recent):
+            recent = list(self.recent)[::-1]
+            return recent[offset:offset + limit]
+        return self.store.page(self.session_id, offset, limit)
+
+    def iter_records(self, with_ids=False):
+        return self.store.iter_records(self.session_id, with_ids=with_ids)
+
+    def get(self, record_id):
+        return self.store.get(self.session_id, record_id)
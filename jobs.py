@@ -0,0 +1,146 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# --- 백그라운드 작업 설정 (환경변수로 조정 가능) ---
+JOB_WORKERS = int(os.getenv("CRISIS_JOB_WORKERS", "8"))                # 서버 전체에서 동시에 도는 LLM 작업 수
+JOB_MAX_QUEUED = int(os.getenv("CRISIS_JOB_MAX_QUEUED", "32"))         # 이보다 많이 밀려 있으면 새 작업을 받지 않는다
+JOB_ABANDON_AFTER = float(os.getenv("CRISIS_JOB_ABANDON_AFTER", "30"))  # 이 시간 동안 아무도 폴링하지 않으면 취소 (닫힌 탭)
+JOB_RESULT_TTL = float(os.getenv("CRISIS_JOB_RESULT_TTL", "600"))      # 끝난 작업을 찾아갈 수 있는 시간(초)
+JOB_POLL_INTERVAL = float(os.getenv("CRISIS_JOB_POLL_INTERVAL", "0.5"))  # UI 폴링 주기(초)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    """백그라운드에서 도는 LLM 작업 하나.
+
+    작업 함수는 stream() 으로 받은 텍스트를 UI 에 보이게 남기고, UI 는 폴링할 때마다
+    touch() 로 아직 보고 있다는 신호를 보낸다. 신호가 abandon_after 초 동안 없으면
+    버려진 작업으로 보고 취소한다.
+    """
+
+    def __init__(self, kind, abandon_after=JOB_ABANDON_AFTER):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.label = ""          # 현재 단계 설명 (UI 표시용)
+        self.text = ""           # 지금까지 받은 텍스트 (UI 표시용)
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.abandon_after = abandon_after
+        self._last_seen = time.monotonic()
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        # 명시적으로 취소됐거나, 폴링하던 탭이 사라졌으면 True
+        return self._cancel.is_set() or time.monotonic() - self._last_seen > self.abandon_after
+
+    def touch(self):
+        self._last_seen = time.monotonic()
+
+    def cancel(self):
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED)  # 아직 대기열에 있던 작업
+
+    def stream(self, chunks, label="", show=True, render=None):
+        # chunks 를 끝까지 읽어 이어 붙인 텍스트를 돌려준다. 취소되면 스트림을 닫고 None.
+        # render 가 있으면 화면에는 render(chunk) 의 반환값을 보인다 (구조화 출력 파서 등).
+        self.label = label
+        if show:
+            self.text = ""
+        parts = []
+        try:
+            for chunk in chunks:
+                if self.cancelled:
+                    return None
+                parts.append(chunk)
+                if show and render is not None:
+                    self.text = render(chunk)
+                elif show:
+                    self.text += chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()  # stream_ai_brain 이면 HTTP 스트림도 함께 닫힌다
+        return "".join(parts)
+
+    def _finish(self, status, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished_at = time.monotonic()
+        self.status = status
+
+
+class JobExecutor:
+    """서버 전체가 공유하는 크기 제한 작업 실행기.
+
+    동시에 도는 작업은 workers 개, 대기열은 max_queued 개까지만 받는다. 넘치면 submit()
+    이 None 을 돌려주므로 호출자는 '잠시 후 다시' 안내를 띄운다. 끝난 작업은
+    result_ttl 동안 보관했다가 정리한다.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED, result_ttl=JOB_RESULT_TTL):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args):
+        # fn(job, *args) 를 워커 스레드에서 실행하고, 반환값은 job.result 에 남는다.
+        with self._lock:
+            self._sweep()
+            if sum(1 for job in self._jobs.values() if job.status == QUEUED) >= self.max_queued:
+                return None
+            job = Job(kind)
+            self._jobs[job.id] = job
+            job._future = self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {"running": statuses.count(RUNNING), "queued": statuses.count(QUEUED),
+                "workers": self.workers, "max_queued": self.max_queued}
+
+    def _run(self, job, fn, args):
+        if job.cancelled:
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        try:
+            result = fn(job, *args)
+        except Exception as e:
+            job._finish(FAILED, error=f"{type(e).__name__}: {e}")
+            return
+        job._finish(CANCELLED if job.cancelled else DONE, result=result)
+
+    def _sweep(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.result_ttl:
+                del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_job_executor():
+    # 모든 세션이 공유하는 프로세스 단일 실행기
+    return JobExecutor()
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+import streamlit as st
+
+# --- 캐시 설정 (환경변수로 조정 가능) ---
+CACHE_ENABLED = os.getenv("CRISIS_LLM_CACHE", "1") != "0"
+CACHE_PATH = os.getenv("CRISIS_LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+CACHE_TTL = float(os.getenv("CRISIS_LLM_CACHE_TTL", str(7 * 24 * 3600)))    # 초
+CACHE_MAX_ENTRIES = int(os.getenv("CRISIS_LLM_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("CRISIS_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EVICT_EVERY = 50  # put 이 이만큼 쌓일 때마다 정리
+
+
+class LLMCache:
+    """LLM 응답을 SQLite 에 저장하는 LRU + TTL 캐시.
+
+    여러 Streamlit 세션(스레드)과 프로세스가 동시에 써도 되도록 WAL 모드와
+    스레드별 커넥션을 쓴다.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(provider, model, temperature, system_role, user_prompt, max_tokens=None):
+        raw = json.dumps([provider, model, temperature, system_role, user_prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, response, provider=None, model=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, response, size, created, accessed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, response, len(response.encode()), now, now)
+        )
+        with self._lock:
+            self._puts += 1
+            due = self._puts % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            # 개수 제한: 가장 오래 안 쓰인 것부터 삭제
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            # 용량 제한: 최근 사용 순 누적 크기가 한도를 넘는 항목 삭제
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS total FROM responses)"
+                " WHERE total > ?)",
+                (self.max_bytes,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._conn().execute("DELETE FROM responses")
+
+    def stats(self):
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits, "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": entries, "bytes": size,
+        }
+
+
+@st.cache_resource
+def get_llm_cache():
+    # 비활성화되어 있으면 None
+    return LLMCache() if CACHE_ENABLED else None
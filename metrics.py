@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import threading
+from collections import deque, defaultdict
+
+import streamlit as st
+
+# --- 계측 설정 (환경변수로 조정 가능) ---
+METRICS_DIR = os.getenv("CRISIS_METRICS_DIR", os.path.join(".cache", "metrics"))
+METRICS_BUFFER = int(os.getenv("CRISIS_METRICS_BUFFER", "5000"))        # 패널용으로 메모리에 두는 최근 호출 수
+PROM_WRITE_INTERVAL = float(os.getenv("CRISIS_METRICS_PROM_INTERVAL", "5"))
+LOG_MAX_BYTES = int(os.getenv("CRISIS_METRICS_LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # 넘으면 로그 회전 (0 이면 끔)
+LOG_BACKUPS = int(os.getenv("CRISIS_METRICS_LOG_BACKUPS", "5"))                        # 보관할 이전 로그 수 (.1 ~ .N)
+
+# 모델별 대략적인 공시 단가 (USD / 1M tokens): (입력, 출력)
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "mistral-small-latest": (0.10, 0.30),
+}
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * price_in + (completion_tokens or 0) * price_out) / 1_000_000
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def _labels(**labels):
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in labels.items()}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+
+class MetricsRecorder:
+    """call_ai_brain 호출 기록기.
+
+    호출마다 JSON Lines 한 줄을 남기고, 누적 카운터를 Prometheus 텍스트 포맷 파일로
+    주기적으로 덮어쓴다. 최근 호출은 사이드바 ops 패널용으로 메모리 링버퍼에 둔다.
+    JSON Lines 로그는 max_bytes 를 넘으면 ai_calls.jsonl.1 ~ .backups 로 밀어낸다.
+    """
+
+    def __init__(self, directory=METRICS_DIR, buffer_size=METRICS_BUFFER, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.directory = directory
+        self.log_path = os.path.join(directory, "ai_calls.jsonl")
+        self.prom_path = os.path.join(directory, "ai_calls.prom")
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        self.recent = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)     # (name, labels) -> value
+        self._histograms = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])  # 버킷들, +Inf, 합계
+        self._last_prom_write = 0.0
+
+    def record(self, provider, model, phase, wall_s, ttft_s=None, prompt_tokens=None, completion_tokens=None,
+               retries=0, error=None, cached=False, stream=False):
+        entry = {
+            "ts": time.time(), "provider": provider, "model": model, "phase": phase or "other",
+            "wall_s": round(wall_s, 4), "ttft_s": None if ttft_s is None else round(ttft_s, 4),
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+            "retries": retries, "error": error, "cached": cached, "stream": stream,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        status = "error" if error else ("cached" if cached else "ok")
+        with self._lock:
+            self.recent.append(entry)
+            size = len(line.encode("utf-8"))
+            if self.max_bytes and self._log_size and self._log_size + size > self.max_bytes:
+                self._rotate()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                self._log_size = f.tell()  # 다른 프로세스(batch_grade 등)가 같이 써도 실제 크기를 따라간다
+            base = dict(provider=provider, phase=entry["phase"])
+            self._counters[("crisis_ai_calls_total", _labels(**base, status=status))] += 1
+            self._counters[("crisis_ai_retries_total", _labels(**base))] += retries
+            self._counters[("crisis_ai_tokens_total", _labels(provider=provider, kind="prompt"))] += prompt_tokens or 0
+            self._counters[("crisis_ai_tokens_total", _labels(provider=provider, kind="completion"))] += completion_tokens or 0
+            self._counters[("crisis_ai_cost_usd_total", _labels(provider=provider))] += entry["cost_usd"]
+            if not cached:
+                self._observe(_labels(**base), wall_s)
+            due = time.monotonic() - self._last_prom_write >= PROM_WRITE_INTERVAL
+        if due:
+            self.write_prometheus()
+        return entry
+
+    def _rotate(self):
+        # ai_calls.jsonl -> .1 -> .2 ... -> .backups (가장 오래된 것은 버림). self._lock 안에서 호출
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.log_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.log_path, f"{self.log_path}.1")
+        else:
+            os.remove(self.log_path)
+        self._log_size = 0
+
+    def _observe(self, labels, value):
+        hist = self._histograms[labels]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[len(LATENCY_BUCKETS)] += 1  # +Inf (= count)
+        hist[-1] += value
+
+    def exposition(self):
+        # Prometheus 텍스트 포맷
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+        lines = []
+        for name in sorted({n for n, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{labels} {value:g}")
+        lines.append("# TYPE crisis_ai_latency_seconds histogram")
+        for labels, hist in sorted(histograms.items()):
+            inner = labels[1:-1]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                lines.append(f'crisis_ai_latency_seconds_bucket{{{inner},le="{bound:g}"}} {hist[i]}')
+            lines.append(f'crisis_ai_latency_seconds_bucket{{{inner},le="+Inf"}} {hist[len(LATENCY_BUCKETS)]}')
+            lines.append(f"crisis_ai_latency_seconds_sum{labels} {hist[-1]:g}")
+            lines.append(f"crisis_ai_latency_seconds_count{labels} {hist[len(LATENCY_BUCKETS)]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        # node_exporter textfile collector 가 읽다가 깨진 파일을 보지 않도록 rename 으로 교체
+        text = self.exposition()
+        tmp = self.prom_path + f".{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self.prom_path)
+        with self._lock:
+            self._last_prom_write = time.monotonic()
+
+    def summary(self):
+        # provider 별 p50/p95 지연, 토큰, 비용 (최근 버퍼 기준)
+        with self._lock:
+            entries = list(self.recent)
+        groups = defaultdict(list)
+        for e in entries:
+            groups[e["provider"]].append(e)
+        rows = []
+        for provider, items in sorted(groups.items()):
+            live = [e for e in items if not e["cached"] and not e["error"]]
+            walls = [e["wall_s"] for e in live]
+            ttfts = [e["ttft_s"] for e in live if e["ttft_s"] is not None]
+            rows.append({
+                "provider": provider,
+                "calls": len(items),
+                "errors": sum(1 for e in items if e["error"]),
+                "cached": sum(1 for e in items if e["cached"]),
+                "p50_s": _percentile(walls, 50),
+                "p95_s": _percentile(walls, 95),
+                "ttft_p50_s": _percentile(ttfts, 50),
+                "prompt_tokens": sum(e["prompt_tokens"] or 0 for e in items),
+                "completion_tokens": sum(e["completion_tokens"] or 0 for e in items),
+                "cost_usd": round(sum(e["cost_usd"] for e in items), 4),
+            })
+        return rows
+
+    def phase_summary(self):
+        # 단계별 비용/지연: 어느 단계가 비용을 지배하는지 확인용
+        with self._lock:
+            entries = list(self.recent)
+        groups = defaultdict(list)
+        for e in entries:
+            groups[(e["provider"], e["phase"])].append(e)
+        rows = []
+        for (provider, phase), items in sorted(groups.items()):
+            walls = [e["wall_s"] for e in items if not e["cached"] and not e["error"]]
+            rows.append({
+                "provider": provider, "phase": phase, "calls": len(items),
+                "p50_s": _percentile(walls, 50), "p95_s": _percentile(walls, 95),
+                "tokens": sum((e["prompt_tokens"] or 0) + (e["completion_tokens"] or 0) for e in items),
+                "cost_usd": round(sum(e["cost_usd"] for e in items), 4),
+            })
+        return rows
+
+
+@st.cache_resource
+def get_metrics():
+    # 모든 세션이 공유하는 프로세스 단일 기록기
+    return MetricsRecorder()
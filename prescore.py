@@ -0,0 +1,139 @@
+import os
+import re
+import hashlib
+from collections import deque
+import numpy as np
+
+# --- 가채점 설정 (환경변수로 조정 가능) ---
+PRESCORE_MIN_ACTION = int(os.getenv("CRISIS_PRESCORE_MIN_ACTION", "5"))          # 내부 조치 최소 글자 수
+PRESCORE_MIN_NOTICE = int(os.getenv("CRISIS_PRESCORE_MIN_NOTICE", "30"))         # 공지 최소 글자 수
+PRESCORE_EXEMPLAR_SCORE = int(os.getenv("CRISIS_PRESCORE_EXEMPLAR_SCORE", "80"))  # 이 점수 이상 받은 공지를 모범 사례로
+PRESCORE_MAX_EXEMPLARS = int(os.getenv("CRISIS_PRESCORE_MAX_EXEMPLARS", "200"))
+HASH_DIM = 4096
+
+# 공지에 들어 있으면 점수를 주는 요소: 이름 -> (정규식, 배점, 빠졌을 때 안내)
+FEATURES = {
+    "apology": (r"사과|죄송|송구|불편을 드려|심려", 20, "사과 표현이 없습니다."),
+    "compensation": (r"보상|지급|환불|쿠폰|선물|우편함|재화|다이아|골드", 20, "보상 안내가 없습니다."),
+    "timeline": (r"\d+\s*(시|분|일|월)|오전|오후|까지|이내|예정|일정", 20, "처리 일정(언제까지)이 없습니다."),
+    "cause": (r"원인|확인|조사|파악|오류|버그", 10, "원인 설명이 없습니다."),
+    "prevention": (r"재발|방지|모니터링|개선|검수", 15, "재발 방지 계획이 없습니다."),
+}
+LENGTH_POINTS = 15          # 공지 길이 배점 (LENGTH_FULL 글자 이상이면 만점)
+LENGTH_FULL = 150
+SIMILARITY_WEIGHT = 0.3     # 모범 공지가 있을 때 유사도가 차지하는 비중
+SIMILARITY_FULL = 0.5       # 모범 공지와 이만큼 비슷하면 유사도 만점
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+
+class TfidfIndex:
+    """문자 2~3-gram 을 HASH_DIM 칸으로 해싱한 TF-IDF 행렬.
+
+    행은 L2 정규화해 두므로 질의 벡터와의 내적만으로 모든 문서와의 코사인 유사도를 얻는다.
+    공지 하나가 채우는 칸은 수백 개뿐이라 행렬은 (행, 칸, 값) 희소 배열로 세션 상태에 둔다.
+    한글은 띄어쓰기가 들쭉날쭉해서 단어 대신 문자 n-gram 을 쓴다.
+    """
+
+    def __init__(self, docs, dim=HASH_DIM):
+        self.dim = dim
+        rows = [np.unique(self._buckets(doc), return_counts=True) for doc in docs]
+        df = np.zeros(dim, dtype=np.int64)
+        for buckets, _ in rows:
+            df[buckets] += 1
+        self.idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+        self.rows = np.repeat(np.arange(len(rows), dtype=np.int32), [len(b) for b, _ in rows])
+        self.cols = np.concatenate([b for b, _ in rows]).astype(np.int16) if rows else np.zeros(0, np.int16)
+        weights = [np.log1p(c.astype(np.float32)) * self.idf[b] for b, c in rows]
+        self.values = np.concatenate([w / (np.linalg.norm(w) or 1) for w in weights]).astype(np.float32) if rows else np.zeros(0, np.float32)
+        self.size = len(rows)
+
+    def _buckets(self, text):
+        text = _normalize(text)
+        grams = [text[i:i + n] for n in (2, 3) for i in range(len(text) - n + 1)]
+        return np.fromiter((hash(g) % self.dim for g in grams), dtype=np.int64, count=len(grams))
+
+    def _weight(self, counts):
+        weights = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weights, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return weights / norms
+
+    def similarities(self, text):
+        counts = np.zeros(self.dim, dtype=np.float32)
+        np.add.at(counts, self._buckets(text), 1)
+        query = self._weight(counts)
+        return np.bincount(self.rows, weights=self.values * query[self.cols], minlength=self.size)
+
+
+class PreScorer:
+    """LLM 평가 전에 CPU 만으로 몇 ms 안에 도는 가채점기.
+
+    공지 길이와 사과/보상/일정 등의 키워드, 이 세션에서 높은 점수를 받았던 공지와의
+    유사도로 가채점을 매긴다. 너무 짧은 답안은 거절하고, 같은 시나리오에 공백/대소문자만
+    다른 같은 답안을 이미 평가받았으면 그 기록을 돌려준다.
+
+    세션 상태에 오래 남으므로 본문은 들고 있지 않는다. records 는 (기록 ID, 기록) 쌍이고,
+    중복이 실제로 걸렸을 때만 fetch(기록 ID) 로 저장소에서 기록을 읽는다.
+    """
+
+    def __init__(self, records, fetch):
+        self._fetch = fetch
+        self._submissions = {}   # (Crisis, 조치, 공지) 정규화 해시 -> 평가 본문이 남아 있는 가장 최근 기록 ID
+        exemplars = deque(maxlen=PRESCORE_MAX_EXEMPLARS)
+        for record_id, record in records:
+            if record.get("Crisis") and record.get("Feedback"):
+                self._submissions[self._key(record["Crisis"], record.get("User_Action"), record.get("User_Notice"))] = record_id
+            if (record.get("Score") or 0) >= PRESCORE_EXEMPLAR_SCORE and record.get("User_Notice"):
+                exemplars.append(record["User_Notice"])
+        self._exemplars = TfidfIndex(list(exemplars)) if exemplars else None
+
+    def score(self, public, action, notice):
+        issues = []
+        if len((action or "").strip()) < PRESCORE_MIN_ACTION:
+            issues.append(f"내부 조치를 {PRESCORE_MIN_ACTION}자 이상 적어 주세요.")
+        if len((notice or "").strip()) < PRESCORE_MIN_NOTICE:
+            issues.append(f"공지사항을 {PRESCORE_MIN_NOTICE}자 이상 적어 주세요.")
+        reject = bool(issues)
+
+        points = min(1.0, len((notice or "").strip()) / LENGTH_FULL) * LENGTH_POINTS
+        for pattern, weight, hint in FEATURES.values():
+            if re.search(pattern, notice or ""):
+                points += weight
+            else:
+                issues.append(hint)
+
+        similarity = None
+        if self._exemplars is not None:
+            similarity = float(self._exemplars.similarities(notice or "").max())
+            points = (1 - SIMILARITY_WEIGHT) * points + SIMILARITY_WEIGHT * min(1.0, similarity / SIMILARITY_FULL) * 100
+
+        return {
+            "score": int(round(min(100, points))),
+            "issues": issues,
+            "reject": reject,
+            "similarity": similarity,
+            "duplicate": None if reject else self._find_duplicate(public, action, notice),
+        }
+
+    def _find_duplicate(self, public, action, notice):
+        record_id = self._submissions.get(self._key(public, action, notice))
+        record = self._fetch(record_id) if record_id is not None else None
+        return record if record and record.get("Feedback") else None  # 그사이 보존 정책으로 지워졌거나 압축된 기록
+
+    @staticmethod
+    def _key(public, action, notice):
+        # 재사용은 텍스트가 같을 때만. 유사도로 고르면 숫자 하나("500개"->"5000개")나
+        # 부정어("회수하지 않을") 같은 작은 수정에도 이전 평가가 나온다.
+        text = "\x1f".join((_normalize(public), _normalize(action), _normalize(notice)))
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def get_prescorer(history, cache):
+    # 기록이 바뀔 때만 다시 만든다. cache 는 세션 상태에 둔 dict
+    if cache.get("version") != history.version:
+        cache["scorer"] = PreScorer(history.iter_records(with_ids=True), history.get)
+        cache["version"] = history.version
+    return cache["scorer"]
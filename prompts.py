@@ -0,0 +1,80 @@
+import os
+import re
+
+# --- 토큰 예산 (환경변수로 조정 가능) ---
+# 단계별 출력 상한. 3줄 요약인 기밀 보고에 2000 토큰을 열어 둘 이유가 없다.
+PHASE_MAX_TOKENS = {
+    "briefing": int(os.getenv("CRISIS_MAX_TOKENS_BRIEFING", "1000")),
+    "secret": int(os.getenv("CRISIS_MAX_TOKENS_SECRET", "300")),
+    "evaluation": int(os.getenv("CRISIS_MAX_TOKENS_EVALUATION", "1500")),
+    "mentor": int(os.getenv("CRISIS_MAX_TOKENS_MENTOR", "1500")),
+    "repair": int(os.getenv("CRISIS_MAX_TOKENS_REPAIR", "600")),
+}
+DEFAULT_MAX_TOKENS = 2000
+
+# 위 상한 위에 provider 별로 더 열어 두는 출력 토큰. gemini-2.5-flash 는 기본으로 생각(thinking)을 하고
+# 그 토큰도 max_output_tokens 에 포함되므로, 상한이 빠듯하면 본문 없이 끝날 수 있다.
+# (google-generativeai SDK 로는 생각을 끌 수 없어 여유분을 준다. 실제로 쓴 만큼만 과금된다.)
+PROVIDER_OUTPUT_HEADROOM = {
+    "Google Gemini": int(os.getenv("CRISIS_GEMINI_THINKING_TOKENS", "2048")),
+}
+
+# 단계별 user 메시지 입력 상한. 넘으면 가장 긴 칸부터 가운데를 줄인다.
+PHASE_INPUT_BUDGET = {
+    "secret": int(os.getenv("CRISIS_INPUT_BUDGET_SECRET", "1500")),
+    "evaluation": int(os.getenv("CRISIS_INPUT_BUDGET_EVALUATION", "3000")),
+    "mentor": int(os.getenv("CRISIS_INPUT_BUDGET_MENTOR", "2500")),
+    "repair": int(os.getenv("CRISIS_INPUT_BUDGET_REPAIR", "2000")),
+}
+
+ELLIPSIS = " …(중략)… "
+
+
+def max_tokens_for(phase):
+    return PHASE_MAX_TOKENS.get(phase, DEFAULT_MAX_TOKENS)
+
+
+def output_cap(provider, max_tokens):
+    # 실제로 provider 에 보내는 출력 상한 (본문 상한 + provider 별 여유분)
+    return max_tokens + PROVIDER_OUTPUT_HEADROOM.get(provider, 0)
+
+
+def compact(text):
+    # 줄마다 앞뒤 공백과 연속 공백을 줄이고, 빈 줄은 최대 한 줄만 남긴다.
+    lines = [re.sub(r"[ \t　]+", " ", line).strip() for line in (text or "").splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def estimate_tokens(text):
+    # provider 마다 토크나이저가 달라 대략치만 쓴다: ASCII 는 4글자당 1토큰, 한글 등은 1글자당 1토큰.
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _shorten(text, tokens):
+    # 앞 2/3, 뒤 1/3 을 남기고 가운데를 잘라 대략 tokens 토큰으로 맞춘다.
+    chars = max(40, int(len(text) * tokens / max(1, estimate_tokens(text))))
+    if chars >= len(text):
+        return text
+    head = chars * 2 // 3
+    return text[:head].rstrip() + ELLIPSIS + text[len(text) - (chars - head):].lstrip()
+
+
+def render_sections(sections, budget=None, verbatim=()):
+    # [(label, text), ...] 를 "[label] text" 줄로 잇는다. budget(토큰)을 넘으면 가장 긴 칸부터 줄인다.
+    # 칸 순서는 그대로라서 앞쪽 칸이 같으면 메시지 앞부분도 바이트 단위로 같다 (provider 프롬프트 캐시 적중).
+    # verbatim 에 든 칸(사용자가 쓴 답안 등)은 앞뒤 공백만 떼고 줄이거나 다듬지 않는다.
+    sections = [(label, (text or "").strip() if label in verbatim else compact(text)) for label, text in sections]
+    if budget:
+        shrinkable = [i for i, (label, _) in enumerate(sections) if label not in verbatim]
+        for _ in range(len(shrinkable)):
+            sizes = [estimate_tokens(text) for _, text in sections]
+            excess = sum(sizes) - budget
+            if excess <= 0:
+                break
+            i = max(shrinkable, key=sizes.__getitem__)
+            label, text = sections[i]
+            sections[i] = (label, _shorten(text, max(sizes[i] - excess, sizes[i] // 4)))
+    return "\n".join(f"[{label}] {text}" for label, text in sections)
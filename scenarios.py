@@ -0,0 +1,192 @@
+import os
+import random
+import threading
+import time
+import hashlib
+import queue
+from collections import OrderedDict, deque
+
+import streamlit as st
+
+from ai_brain import call_ai_brain, clean_ai_response, is_ai_error
+from prompts import PHASE_INPUT_BUDGET, render_sections
+
+# --- 프리페치 풀 설정 ---
+POOL_DEPTH = int(os.getenv("CRISIS_SCENARIO_POOL_DEPTH", "2"))        # 조합별로 미리 만들어 둘 시나리오 수
+POOL_MAX_TOTAL = int(os.getenv("CRISIS_SCENARIO_POOL_MAX", "64"))     # 풀 전체에 보관할 최대 시나리오 수
+POOL_WORKERS = int(os.getenv("CRISIS_SCENARIO_POOL_WORKERS", "1"))
+POOL_IDLE_TTL = float(os.getenv("CRISIS_SCENARIO_POOL_IDLE_TTL", "3600"))
+
+# --- 시나리오 재료 ---
+HARD_KEYWORDS = {
+    "MMORPG": "경제 붕괴(골드 인플레), 아이템 복사 버그, 랭커/방송인 특혜 논란, 공성전 서버 다운, 작업장/매크로 방치, 강화 확률 조작 의혹, 특정 길드 편파 운영, 운영자 계정 남용",
+    "수집형 RPG (가챠)": "매출 관련 이슈, 확률 조작(천장 미적용), 일러스트 검열/표절(트레이싱), 픽업 일정 통수(이중 픽업), 캐릭터 성능 잠수함 너프, 사료(보상) 차별, 한정 캐릭터 복각 논란",
+    "FPS/TPS (슈팅)": "신종 핵(ESP/에임봇) 창궐, 넷코드(핑) 이슈, 밸런스 붕괴(사기총 방치), 맵 글리치(벽뚫기), 대회 공정성(방플), 티밍(어뷰징), 키보드/마우스 컨버터 논란",
+    "MOBA (AOS)": "서버 팅김(재접 불가), 치명적 버그(스킬 쿨타임 0초), 트롤/패작/대리 제재 미흡, 신챔프 OP 논란, 매칭 시스템(다인큐) 불공정, 닷지 버그 악용, 오브젝트 버그",
+    "스포츠/레이싱": "라이선스 만료(선수/차량 삭제), 물리 엔진 오류(차량 날아감/선수 끼임), P2W(현질) 밸런스 붕괴, 렉/핑으로 인한 승패 판정 오류, 랭킹 어뷰징, 카드깡 확률 논란",
+    "퍼즐/캐주얼": "클리어 불가능한 스테이지(난이도 조절 실패), 과도한 광고 노출(플레이 방해), 타 게임 리소스 도용/표절, 데이터 초기화/백섭, 소셜 기능(하트 보내기) 오류, 랭킹 조작",
+    "서브컬처 비주얼 노벨": "스토리/대사 사상 검증(혐오 표현), 번역 퀄리티(오역/밈 남발), 성우 논란(계약 해지), 굿즈 퀄리티 불량, 운영진의 유저 비하 발언, 설정 붕괴"
+}
+
+
+# --- 프롬프트 ---
+# system 은 고정 문자열로 두어 provider 프롬프트 캐시가 맞도록 하고, 장르/난이도/소재는 user 메시지에 싣는다.
+BRIEFING_SYSTEM = (
+    "너는 게임 운영 시뮬레이터의 상황 브리핑 AI다. user 메시지의 게임/난이도/지침/소재에 맞는 위기 상황을 보고해라.\n\n"
+    "**[필수 출력 형식]**\n"
+    "다음 3가지 항목만 포함해서 마크다운으로 작성해라:\n"
+    "1. **사건 개요 (Background)**: 무엇이 문제인가? (구체적인 수치 포함)\n"
+    "2. **유저 반응 (Reactions)**: 커뮤니티 여론, 주요 불만 내용, 시위 여부 등\n"
+    "3. **현재 지표 (Current Status)**: 평점, 동접자 수, 환불 요청 건수 등\n\n"
+    "**[절대 금지 사항]**\n"
+    "- 게임사의 대응(공지, 보상, 해명 등)을 절대 미리 적지 마라.\n"
+    "- 결과(Outcome)나 미래 예측을 적지 마라.\n"
+    "- 오직 '발생한 상황'까지만 보고해라."
+)
+
+SECRET_SYSTEM = (
+    "너는 게임 개발팀의 테크니컬 리드(TD)다. 발생한 위기 상황의 **기술적/내부적 진짜 원인**을 보고해라.\n"
+    "감정을 배제하고 **건조하고 논리적**으로 사실만 서술해라.\n"
+    "유저들의 추측이 맞을 수도 있고, 전혀 다른 엉뚱한 개발자 실수일 수도 있다."
+)
+
+
+def build_public_prompt(genre, platform, difficulty):
+    if "어려움" in difficulty:
+        level_instruction = (
+            "서비스의 존폐가 걸린 **심각한 위기**를 생성해라. 유저들의 분노가 극에 달해 있다. "
+            "단, **'수습 불가능한 수치'(예: 유저 90% 이탈, 전수 조사 결과 100% 표절 등)는 피해라.** "
+            "CM의 역량에 따라 **회생할 수 있는 여지**를 아주 조금은 남겨둬라."
+        )
+        raw_triggers = HARD_KEYWORDS.get(genre, "치명적인 버그, 운영 신뢰도 붕괴")
+    elif "보통" in difficulty:
+        level_instruction = "유저들이 큰 불편을 겪어 불만을 표출하지만, **적절한 사과와 보상으로 충분히 수습 가능한** 수준의 위기를 생성해라."
+        raw_triggers = "점검 시간 연장, 툴팁/텍스트 오기재, 이벤트 보상 미지급, 경미한 밸런스 불만, 번역 어색함"
+    else:
+        level_instruction = "신입 CM이 처리할 수 있는 **가벼운 해프닝이나 단순 실수**를 생성해라."
+        raw_triggers = "단순 오탈자, 공지사항 링크 실수, 10분 내외의 접속 불안정, 이벤트 날짜 표기 혼동"
+
+    trigger_list = [t.strip() for t in raw_triggers.split(',')]
+    pick_count = random.choices([0, 1, 2, 3], weights=[20, 40, 30, 10])[0]
+
+    if pick_count == 0: selected_triggers = "지정된 키워드 없음. (창의적으로 생성)"
+    else: selected_triggers = ", ".join(random.sample(trigger_list, min(pick_count, len(trigger_list))))
+
+    user_msg_public = render_sections([
+        ("게임", f"**'{genre}'({platform})**"),
+        ("난이도", f"**'{difficulty}'**"),
+        ("지침", level_instruction),
+        ("핵심 소재", f"**[{selected_triggers}]**"),
+    ]) + "\n\n지금 발생한 위기 상황을 브리핑해. (형식 엄수)"
+    return BRIEFING_SYSTEM, user_msg_public
+
+
+def build_secret_prompt(public_text):
+    user_msg_secret = render_sections([("상황", public_text)], budget=PHASE_INPUT_BUDGET["secret"])
+    return SECRET_SYSTEM, user_msg_secret + "\n\n위 상황의 진짜 내부 원인(Secret)을 3줄 내외로 요약 보고해."
+
+
+def generate_scenario(provider, api_key, genre, platform, difficulty, temperature=0.5):
+    # 화면 없이 public + secret 한 쌍을 만든다. 실패하면 None.
+    sys_msg, user_msg = build_public_prompt(genre, platform, difficulty)
+    public_text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=temperature, use_cache=False, phase="briefing"))
+    if is_ai_error(public_text):
+        return None
+    sys_msg, user_msg = build_secret_prompt(public_text)
+    secret_text = clean_ai_response(call_ai_brain(provider, api_key, sys_msg, user_msg, temperature=0.3, phase="secret"))
+    if is_ai_error(secret_text):
+        return None
+    return {"public": public_text, "cause": secret_text, "genre": genre}
+
+
+# --- 프리페치 풀 ---
+class ScenarioPool:
+    """(genre, platform, difficulty) 별로 미리 만든 시나리오를 쌓아 두는 백그라운드 풀.
+
+    키는 호출 비용을 내는 (provider, api_key, temperature) 단위로도 나뉜다.
+    pop() 으로 하나 꺼내면 워커 스레드가 목표 깊이까지 다시 채운다.
+    """
+
+    def __init__(self, depth=POOL_DEPTH, max_total=POOL_MAX_TOTAL, workers=POOL_WORKERS, idle_ttl=POOL_IDLE_TTL):
+        self.depth = depth
+        self.max_total = max_total
+        self.idle_ttl = idle_ttl
+        self._ready = OrderedDict()   # key -> deque[scenario], LRU 순
+        self._pending = {}            # key -> 생성 중/대기 중인 작업 수
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._tasks = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"scenario-pool-{i}", daemon=True).start()
+
+    @staticmethod
+    def _key(provider, api_key, temperature, genre, platform, difficulty):
+        owner = hashlib.sha256(api_key.encode()).hexdigest()
+        return (provider, owner, temperature, genre, platform, difficulty)
+
+    def pop(self, provider, api_key, temperature, genre, platform, difficulty):
+        key = self._key(provider, api_key, temperature, genre, platform, difficulty)
+        with self._lock:
+            self._last_used[key] = time.monotonic()
+            ready = self._ready.get(key)
+            if ready:
+                self._ready.move_to_end(key)
+                return ready.popleft()
+        return None
+
+    def refill(self, provider, api_key, temperature, genre, platform, difficulty):
+        key = self._key(provider, api_key, temperature, genre, platform, difficulty)
+        with self._lock:
+            self._last_used[key] = time.monotonic()
+            missing = self.depth - len(self._ready.get(key, ())) - self._pending.get(key, 0)
+            for _ in range(max(0, missing)):
+                self._pending[key] = self._pending.get(key, 0) + 1
+                self._tasks.put((key, api_key))
+
+    def size(self):
+        with self._lock:
+            return sum(len(q) for q in self._ready.values())
+
+    def _worker(self):
+        while True:
+            key, api_key = self._tasks.get()
+            provider, _, temperature, genre, platform, difficulty = key
+            scenario = None
+            try:
+                # 한동안 아무도 찾지 않은 조합은 만들지 않고 버린다.
+                if time.monotonic() - self._last_used.get(key, 0) <= self.idle_ttl:
+                    scenario = generate_scenario(provider, api_key, genre, platform, difficulty, temperature)
+            except Exception:
+                scenario = None
+            with self._lock:
+                self._pending[key] = max(0, self._pending.get(key, 0) - 1)
+                if not self._pending[key]:
+                    del self._pending[key]
+                if scenario is not None:
+                    self._ready.setdefault(key, deque()).append(scenario)
+                    self._ready.move_to_end(key)
+                    self._evict()
+            self._tasks.task_done()
+
+    def _evict(self):
+        # 전체 보관량을 넘으면 가장 오래 안 쓰인 조합부터 비운다.
+        now = time.monotonic()
+        for key in list(self._ready):
+            if not self._ready[key] or now - self._last_used.get(key, 0) > self.idle_ttl:
+                del self._ready[key]
+        total = sum(len(q) for q in self._ready.values())
+        while total > self.max_total and self._ready:
+            key, ready = next(iter(self._ready.items()))
+            ready.popleft()
+            total -= 1
+            if not ready:
+                del self._ready[key]
+        for key in list(self._last_used):
+            if key not in self._ready and key not in self._pending and now - self._last_used[key] > self.idle_ttl:
+                del self._last_used[key]
+
+
+@st.cache_resource
+def get_scenario_pool():
+    # 모든 세션이 공유하는 프로세스 단일 풀
+    return ScenarioPool()